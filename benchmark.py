@@ -0,0 +1,259 @@
+"""TabletopTracker ベンチマーク
+
+使い方:
+    python benchmark.py concurrent-writes --processes 4 --plays 200
+    python benchmark.py startup --sizes 10000 100000 1000000
+    python benchmark.py xml-parse --items 20000
+    python benchmark.py bgg --games 40 --latency 0.2 --queue 1
+    python benchmark.py stats --sizes 10000 100000
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+
+def _init_streamlit_context():
+    """Streamlit外で DataManager を使うための準備"""
+    import streamlit as st
+    import streamlit.logger
+    from language_manager import LanguageManager
+    streamlit.logger.set_log_level(logging.ERROR)
+    st.session_state.lang_manager = LanguageManager(os.path.join(os.path.dirname(os.path.abspath(__file__)), "language"))
+
+def _sample_play(game_id: str, index: int) -> dict:
+    return {
+        "game_id": game_id,
+        "date": f"2024-{index % 12 + 1:02d}-{index % 28 + 1:02d}",
+        "duration": 30 + index % 90,
+        "scores": {"Alice": index % 50, "Bob": (index * 7) % 50, "Carol": (index * 13) % 50},
+        "detailed_scores": None,
+        "game_type": "Competitive Game"
+    }
+
+def _concurrent_writer(data_dir: str, worker: int, plays: int, backend: str):
+    _init_streamlit_context()
+    from data_manager import DataManager
+    dm = DataManager(data_dir, backend=backend)
+    for i in range(plays):
+        dm.add_play(_sample_play(f"game{worker}", i))
+
+def bench_concurrent_writes(args):
+    """複数プロセスから同じデータディレクトリへ同時にプレイを追加"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        workers = [
+            multiprocessing.Process(target=_concurrent_writer, args=(data_dir, worker, args.plays, args.backend))
+            for worker in range(args.processes)
+        ]
+        start = time.perf_counter()
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        _init_streamlit_context()
+        from data_manager import DataManager
+        plays = DataManager(data_dir, backend=args.backend).data["plays"]
+        expected = args.processes * args.plays
+        unique_ids = len({p["id"] for p in plays})
+
+        print(f"backend={args.backend} processes={args.processes} plays/process={args.plays}")
+        print(f"elapsed: {elapsed:.2f}s  throughput: {expected / elapsed:.1f} plays/s")
+        print(f"stored: {len(plays)}/{expected}  unique ids: {unique_ids}")
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def bench_startup(args):
+    """合成データ（N件のプレイ）での起動時間: YAML解析 vs バイナリキャッシュ"""
+    import yaml
+    from yaml_store import SafeLoader, read_yaml_file, write_yaml_file
+    _init_streamlit_context()
+    from data_manager import DataManager
+
+    print(f"libyaml: {yaml.__with_libyaml__}  loader: {SafeLoader.__name__}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as data_dir:
+            plays = [dict(_sample_play(f"game{i % 50}", i), id=i) for i in range(size)]
+            plays_path = os.path.join(data_dir, "plays.yaml")
+            write_elapsed, _ = _timed(lambda: write_yaml_file(plays_path, plays, 1))
+            del plays
+            size_mb = os.path.getsize(plays_path) / 1024 / 1024
+
+            results = [f"write {write_elapsed:.2f}s"]
+            if args.pure_python:
+                with open(plays_path, 'rb') as f:
+                    raw = f.read()
+                elapsed, _ = _timed(lambda: yaml.load(raw, Loader=yaml.SafeLoader))
+                results.append(f"pure-python parse {elapsed:.2f}s")
+            elapsed, _ = _timed(lambda: read_yaml_file(plays_path))
+            results.append(f"yaml parse {elapsed:.2f}s")
+
+            # キャッシュ無しの初回起動 → キャッシュ作成後の起動
+            cache_dir = os.path.join(data_dir, ".cache")
+            elapsed, _ = _timed(lambda: DataManager(data_dir).data["plays"])
+            results.append(f"cold start {elapsed:.2f}s")
+            elapsed, plays = _timed(lambda: DataManager(data_dir).data["plays"])
+            results.append(f"warm start {elapsed:.2f}s")
+            assert len(plays) == size and os.path.isdir(cache_dir)
+            # サイドバーの件数表示のみ（プレイ記録は読み込まない）
+            elapsed, count = _timed(lambda: DataManager(data_dir).count("plays"))
+            results.append(f"count only {elapsed * 1000:.1f}ms")
+            assert count == size
+
+            print(f"plays={size:>8,} ({size_mb:.1f} MB): " + "  ".join(results))
+
+def _measure(func):
+    """実行時間とピークメモリ（tracemalloc）"""
+    import tracemalloc
+    tracemalloc.start()
+    elapsed, result = _timed(func)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024, result
+
+def bench_xml_parse(args):
+    """BGG応答XMLの解析: ツリー全体の構築 vs iterparse による逐次解析"""
+    import xml.etree.ElementTree as ET
+    from bgg_fixtures import synthetic_search_xml, synthetic_thing_xml
+    _init_streamlit_context()
+    from bgg_api import BGGApi
+
+    fixtures = [
+        ("search", args.search_fixture, lambda: synthetic_search_xml("Game", args.items)),
+        ("thing", args.thing_fixture, lambda: synthetic_thing_xml([str(i) for i in range(args.items // 10)])),
+    ]
+    for endpoint, fixture_path, synthesize in fixtures:
+        if fixture_path:
+            with open(fixture_path, 'rb') as f:
+                content = f.read()
+        else:
+            content = synthesize()
+
+        if endpoint == "search":
+            tree_parse = lambda: len(ET.fromstring(content).findall(".//item"))
+            stream_parse = lambda: sum(1 for _ in BGGApi.iter_search_results(content))
+        else:
+            tree_parse = lambda: len([BGGApi._parse_game_item(item, item.get("id")) for item in ET.fromstring(content).findall(".//item")])
+            stream_parse = lambda: len([BGGApi._parse_game_item(item, item.get("id")) for item in BGGApi._iter_items(content)])
+
+        tree_elapsed, tree_peak, tree_count = _measure(tree_parse)
+        stream_elapsed, stream_peak, stream_count = _measure(stream_parse)
+        assert tree_count == stream_count
+        print(f"/{endpoint}: {stream_count:,} items ({len(content) / 1024 / 1024:.1f} MB)")
+        print(f"  fromstring: {tree_elapsed:.2f}s  peak {tree_peak:.1f} MB")
+        print(f"  iterparse:  {stream_elapsed:.2f}s  peak {stream_peak:.1f} MB")
+
+def bench_bgg(args):
+    """ローカル代替サーバーに対する検索・詳細取得の負荷測定"""
+    _init_streamlit_context()
+    from bgg_stub_server import StubBehavior, start_stub_server
+    import bgg_cache
+    from bgg_api import BGGApi
+    from bgg_fetcher import fetch_games_details
+
+    if args.client_rate:
+        import bgg_http
+        bgg_http.rate_limiter.rate = args.client_rate
+    behavior = StubBehavior(args.fixtures, args.latency, args.queue, args.rate_limit, synthetic=True)
+    server, base_url = start_stub_server(behavior)
+    BGGApi.BASE_URL = base_url
+    game_ids = [str(i) for i in range(1, args.games + 1)]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # 毎回空のキャッシュから測定
+        bgg_cache.DEFAULT_CACHE_PATH = os.path.join(cache_dir, "bgg_http.sqlite3")
+        try:
+            elapsed, _ = _timed(lambda: [BGGApi.search_games(f"query {i}") for i in range(args.searches)])
+            print(f"search x{args.searches}: {elapsed:.2f}s")
+            elapsed, _ = _timed(lambda: [BGGApi.search_games(f"query {i}") for i in range(args.searches)])
+            print(f"search x{args.searches} (cached): {elapsed * 1000:.1f}ms")
+            elapsed, details = _timed(lambda: BGGApi.get_games_details(game_ids))
+            print(f"batched details x{args.games}: {elapsed:.2f}s ({len(details)} ok)")
+            # 別のディレクトリに切り替え、バッチ取得の応答キャッシュを使わせない
+            bgg_cache.DEFAULT_CACHE_PATH = os.path.join(cache_dir, "concurrent", "bgg_http.sqlite3")
+            elapsed, details = _timed(lambda: fetch_games_details(game_ids))
+            print(f"concurrent details x{args.games}: {elapsed:.2f}s ({len(details)} ok)")
+        finally:
+            server.shutdown()
+    print(f"stand-in requests: {behavior.requests}  statuses: {behavior.status_counts}")
+
+def bench_stats(args):
+    """統計画面の集計: 列指向データの構築時間・メモリと各集計の時間"""
+    import copy
+    from head_to_head import HeadToHead
+    from play_frames import PlayFrames
+    from utils import ensure_play_result_fields
+    from win_rate_intervals import WinRateIntervals
+    _init_streamlit_context()
+
+    for size in args.sizes:
+        # 保存済みの記録と同じく勝敗のフィールドを含める
+        source = [ensure_play_result_fields(dict(_sample_play(f"game{i % 50}", i), id=i)) for i in range(size)]
+        # 入れ子の辞書のままの大きさ（読み込み直後の状態）
+        _, nested_mb, plays = _measure(lambda: copy.deepcopy(source))
+        del source
+        build_elapsed, frames = _timed(lambda: PlayFrames.from_plays(plays))
+        frames_mb = frames.memory_usage() / 1024 / 1024
+
+        # 1プレイ追加したときの差分更新と、保存した表からの起動
+        added = ensure_play_result_fields(dict(_sample_play("game-new", size), id=size, scores={"Dave": 10, "Alice": 5}))
+        append_elapsed, _ = _timed(lambda: frames.extend([added]))
+        with tempfile.TemporaryDirectory() as cache_dir:
+            frames_path = os.path.join(cache_dir, "play_frames.pickle")
+            frames.save(frames_path)
+            load_elapsed, _ = _timed(lambda: PlayFrames.load(frames_path))
+
+        results = [f"build {build_elapsed:.2f}s", f"append-1 {append_elapsed * 1000:.1f}ms", f"load {load_elapsed * 1000:.1f}ms",
+                   f"nested {nested_mb:.1f} MB", f"frames {frames_mb:.1f} MB"]
+        for name, func in (("monthly", frames.monthly_counts), ("per-game", frames.game_totals), ("win-rates", frames.player_totals),
+                           ("head-to-head", lambda: HeadToHead.from_frames(frames).matrices()),
+                           ("beta-intervals", lambda: WinRateIntervals.from_frames(frames, "bayes")),
+                           ("bootstrap-intervals", lambda: WinRateIntervals.from_frames(frames, "bootstrap", resamples=200))):
+            elapsed, _ = _timed(func)
+            results.append(f"{name} {elapsed * 1000:.1f}ms")
+        print(f"plays={size:>8,}: " + "  ".join(results))
+
+def main():
+    parser = argparse.ArgumentParser(description="TabletopTracker benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    concurrent = subparsers.add_parser("concurrent-writes", help="concurrent add_play from several processes")
+    concurrent.add_argument("--processes", type=int, default=4)
+    concurrent.add_argument("--plays", type=int, default=200)
+    concurrent.add_argument("--backend", choices=["yaml", "sqlite"], default="yaml")
+    concurrent.set_defaults(func=bench_concurrent_writes)
+
+    startup = subparsers.add_parser("startup", help="DataManager startup time over synthetic play histories")
+    startup.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    startup.add_argument("--pure-python", action="store_true", help="also time the pure-Python SafeLoader")
+    startup.set_defaults(func=bench_startup)
+
+    xml_parse = subparsers.add_parser("xml-parse", help="BGG XML parsing time and peak memory")
+    xml_parse.add_argument("--items", type=int, default=20000, help="synthetic /search items (/thing uses a tenth)")
+    xml_parse.add_argument("--search-fixture", help="recorded /search response to parse instead")
+    xml_parse.add_argument("--thing-fixture", help="recorded /thing response to parse instead")
+    xml_parse.set_defaults(func=bench_xml_parse)
+
+    bgg = subparsers.add_parser("bgg", help="search/detail load test against the local BGG stand-in")
+    bgg.add_argument("--searches", type=int, default=10)
+    bgg.add_argument("--games", type=int, default=40)
+    bgg.add_argument("--latency", type=float, default=0.2)
+    bgg.add_argument("--queue", type=int, default=1, help="202 responses before each /thing succeeds")
+    bgg.add_argument("--rate-limit", type=float, default=0.0, help="stand-in requests/s before 429")
+    bgg.add_argument("--client-rate", type=float, help="override the client rate limit (requests/s)")
+    bgg.add_argument("--fixtures", default="fixtures/bgg")
+    bgg.set_defaults(func=bench_bgg)
+
+    stats = subparsers.add_parser("stats", help="statistics aggregation over synthetic play histories")
+    stats.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    stats.set_defaults(func=bench_stats)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
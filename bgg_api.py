@@ -1,124 +1,180 @@
 import streamlit as st
+import io
+import os
 import requests
+import sqlite3
+import threading
+from datetime import datetime
 import xml.etree.ElementTree as ET
-import time
-from typing import Dict, List
+from typing import Dict, Iterator, List, Tuple
+from bgg_cache import DEFAULT_BASE_URL, cache_path_for, get_response_cache
+from bgg_fixtures import record_response
+from bgg_http import BACKGROUND_MAX_WAIT, INTERACTIVE_MAX_WAIT, get_with_retries
+from local_search import get_search_index, search_index_path_for
 
 class BGGApi:
     """BoardGameGeek API クライアント"""
-    BASE_URL = "https://boardgamegeek.com/xmlapi2"
+    # 環境変数でローカルの代替サーバー（bgg_stub_server）などに向けられる
+    BASE_URL = os.environ.get("TABLETOP_BGG_BASE_URL", DEFAULT_BASE_URL)
+    # 設定されていれば成功した応答をこのディレクトリに記録（代替サーバーで再生できる）
+    RECORD_DIR = os.environ.get("TABLETOP_BGG_RECORD_DIR")
+    # /thing に1回で渡すIDの数（BGGの上限）
+    THING_BATCH_SIZE = 20
+    
+    # 裏で再取得中のキャッシュキー（同じ応答を重複して取りに行かない）
+    _revalidating = set()
+    _revalidating_lock = threading.Lock()
+    
+    @staticmethod
+    def _get(endpoint: str, params: Dict, timeout: int, fresh: bool = False,
+             max_wait: float = INTERACTIVE_MAX_WAIT) -> Tuple[int, bytes, datetime]:
+        """BGG APIへのGET（ディスクキャッシュ優先。fresh=True なら必ずAPIを呼ぶ）- (ステータスコード, 本文, 応答の取得日時)"""
+        if not fresh:
+            try:
+                body, stale, fetched_at = get_response_cache(cache_path_for(BGGApi.BASE_URL)).get(endpoint, params)
+            except sqlite3.Error:
+                body, stale = None, False  # キャッシュが使えなくてもAPIは呼べるようにする
+            if body is not None:
+                if stale:
+                    # 古い応答をすぐ返し、最新の応答は裏で取得しておく
+                    BGGApi._revalidate_in_background(endpoint, params, timeout)
+                # キャッシュの応答は実際にBGGから取得した日時を返す（新しく取得したように見せない）
+                return 200, body, datetime.fromtimestamp(fetched_at)
+        fetched_at = datetime.now()
+        status_code, body = BGGApi._fetch(endpoint, params, timeout, max_wait)
+        return status_code, body, fetched_at
+    
+    @staticmethod
+    def _fetch(endpoint: str, params: Dict, timeout: int, max_wait: float = INTERACTIVE_MAX_WAIT) -> Tuple[int, bytes]:
+        """BGG APIを呼び出し、成功した応答をキャッシュに保存（202/429/5xxは max_wait 秒まで待機して再試行）"""
+        response = get_with_retries(f"{BGGApi.BASE_URL}/{endpoint}", params, timeout, max_wait)
+        if response.status_code == 200:
+            try:
+                get_response_cache(cache_path_for(BGGApi.BASE_URL)).put(endpoint, params, response.content)
+            except sqlite3.Error:
+                pass
+            if BGGApi.RECORD_DIR:
+                record_response(BGGApi.RECORD_DIR, endpoint, params, response.content)
+        return response.status_code, response.content
+    
+    @staticmethod
+    def _revalidate_in_background(endpoint: str, params: Dict, timeout: int):
+        """鮮度切れのキャッシュを別スレッドで再取得"""
+        key = (endpoint, tuple(sorted(params.items())))
+        with BGGApi._revalidating_lock:
+            if key in BGGApi._revalidating:
+                return
+            BGGApi._revalidating.add(key)
+        
+        def revalidate():
+            try:
+                BGGApi._fetch(endpoint, params, timeout, BACKGROUND_MAX_WAIT)
+            except Exception:
+                pass  # 失敗しても古い応答を使い続ける
+            finally:
+                with BGGApi._revalidating_lock:
+                    BGGApi._revalidating.discard(key)
+        
+        threading.Thread(target=revalidate, daemon=True).start()
     
     @staticmethod
     def search_games(query: str) -> List[Dict]:
         """ゲーム検索"""
         try:
-            url = f"{BGGApi.BASE_URL}/search"
             params = {"query": query, "type": "boardgame"}
-            response = requests.get(url, params=params, timeout=10)
+            status_code, content, _ = BGGApi._get("search", params, timeout=10)
             
-            if response.status_code == 200:
-                root = ET.fromstring(response.content)
-                
-                games = []
-                for item in root.findall(".//item"):
-                    # 名前の取得を改善
-                    name_elem = item.find("name")
-                    if name_elem is not None:
-                        name = name_elem.get("value", "")
-                    else:
-                        name = st.session_state.lang_manager.get_text("common.unknown_game")
-                    
-                    # 年の取得
-                    year_elem = item.find("yearpublished")
-                    year = year_elem.get("value", "") if year_elem is not None else ""
-                    
-                    game = {
-                        "id": item.get("id"),
-                        "name": name,
-                        "year": year
-                    }
-                    games.append(game)
-                
+            if status_code == 200:
+                games = list(BGGApi.iter_search_results(content))
+                # 検索で見つかった名前もローカル索引に追加（次からはBGGに問い合わせずに見つかる）
+                BGGApi._remember([{"id": game["id"], "year": game["year"], "names": [game["name"]]} for game in games])
                 return games
             else:
-                st.error(st.session_state.lang_manager.get_text("errors.bgg_search_error", code=response.status_code))
+                st.error(st.session_state.lang_manager.get_text("errors.bgg_search_error", code=status_code))
                 
         except Exception as e:
             st.error(st.session_state.lang_manager.get_text("errors.search_error", error=str(e)))
         return []
     
     @staticmethod
-    def get_game_details(game_id: str) -> Dict:
-        """ゲーム詳細情報取得"""
+    def search_local(query: str, registered: Dict[str, Dict] = None) -> List[Dict]:
+        """取得・登録したことのあるゲームからローカル検索（BGGには問い合わせない）"""
         try:
-            url = f"{BGGApi.BASE_URL}/thing"
-            params = {"id": game_id, "stats": "1"}
+            return BGGApi.local_index().search(query, registered)
+        except sqlite3.Error:
+            return []
+    
+    @staticmethod
+    def local_index():
+        """接続先ごとのローカル検索索引"""
+        return get_search_index(search_index_path_for(BGGApi.BASE_URL))
+    
+    @staticmethod
+    def _remember(games: List[Dict]):
+        """取得したゲーム名をローカル索引に追加（失敗しても取得結果はそのまま使う）"""
+        try:
+            BGGApi.local_index().add_games(games)
+        except sqlite3.Error:
+            pass
+    
+    @staticmethod
+    def iter_search_results(content: bytes) -> Iterator[Dict]:
+        """/search の応答XMLから検索結果を1件ずつ返す"""
+        for item in BGGApi._iter_items(content):
+            # 名前の取得を改善
+            name_elem = item.find("name")
+            if name_elem is not None:
+                name = name_elem.get("value", "")
+            else:
+                name = st.session_state.lang_manager.get_text("common.unknown_game")
             
-            # 最大3回まで試行
-            for attempt in range(3):
-                response = requests.get(url, params=params, timeout=15)
-                
-                if response.status_code == 202:
-                    # 202レスポンスの場合は少し待機して再試行
-                    time.sleep(3)
-                    continue
-                elif response.status_code == 200:
-                    break
-                else:
-                    st.error(st.session_state.lang_manager.get_text("errors.bgg_api_error", code=response.status_code))
-                    return {}
+            # 年の取得
+            year_elem = item.find("yearpublished")
+            year = year_elem.get("value", "") if year_elem is not None else ""
             
-            if response.status_code != 200:
-                st.error(st.session_state.lang_manager.get_text("errors.bgg_no_response"))
+            yield {
+                "id": item.get("id"),
+                "name": name,
+                "year": year
+            }
+    
+    @staticmethod
+    def _iter_items(content: bytes) -> Iterator[ET.Element]:
+        """応答XMLの最上位 <item> を順に返す（iterparseで逐次解析し、処理済みの要素は破棄）"""
+        root = None
+        depth = 0
+        for event, elem in ET.iterparse(io.BytesIO(content), events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = elem
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 1 and elem.tag == "item":
+                yield elem
+                # 呼び出し側の処理が終わった要素はツリーから外してメモリを解放
+                root.clear()
+    
+    @staticmethod
+    def get_game_details(game_id: str) -> Dict:
+        """ゲーム詳細情報取得"""
+        try:
+            content, fetched_at = BGGApi._get_thing([str(game_id)])
+            if content is None:
                 return {}
 
-            # XML解析
-            root = ET.fromstring(response.content)
-            
-            item = root.find(".//item")
+            # XML解析（1件目の <item> のみ）
+            item = next(BGGApi._iter_items(content), None)
             if item is None:
                 st.error(st.session_state.lang_manager.get_text("errors.game_info_not_found"))
                 return {}
             
-            # 全ての言語名を取得
-            names = BGGApi._extract_all_names(item)
-            
-            if not names.get("primary"):
+            game_data = BGGApi._parse_game_item(item, game_id, fetched_at)
+            if not game_data:
                 st.error(st.session_state.lang_manager.get_text("errors.game_name_not_found"))
                 return {}
             
-            # 画像URLの取得
-            image_url = BGGApi._extract_image_url(item)
-            
-            # その他の情報取得
-            minplayers_elem = item.find(".//minplayers")
-            min_players = minplayers_elem.get("value", "1") if minplayers_elem is not None else "1"
-            
-            maxplayers_elem = item.find(".//maxplayers")
-            max_players = maxplayers_elem.get("value", "4") if maxplayers_elem is not None else "4"
-            
-            playingtime_elem = item.find(".//playingtime")
-            playing_time = playingtime_elem.get("value", "60") if playingtime_elem is not None else "60"
-            
-            # 最適人数の取得
-            best_player_count = BGGApi.get_best_player_count(item)
-            
-            # 評価情報とランキング情報の取得
-            rating_info = BGGApi._extract_rating_and_ranking(item)
-
-            game_data = {
-                "id": game_id,
-                "names": names,  # 全言語名を保存
-                "name": names.get("primary", ""),  # 後方互換性のため
-                "image_url": image_url,
-                "min_players": str(min_players),
-                "max_players": str(max_players),
-                "playing_time": str(playing_time),
-                "best_player_count": best_player_count,
-                "rating": rating_info["rating"],
-                "ranking": rating_info["ranking"]  # ランキング情報を追加
-            }
-            
+            BGGApi._remember([game_data])
             return game_data
                 
         except requests.exceptions.Timeout:
@@ -129,6 +185,119 @@ class BGGApi:
             st.error(st.session_state.lang_manager.get_text("errors.game_detail_error", error=str(e)))
         return {}
     
+    @staticmethod
+    def get_games_details(game_ids: List[str], on_progress=None, fresh: bool = False) -> Dict[str, Dict]:
+        """複数ゲームの詳細情報を一括取得（THING_BATCH_SIZE 件ずつ1リクエスト）- ゲームID → 詳細"""
+        details, errors = BGGApi.fetch_games_details(game_ids, on_progress=on_progress, fresh=fresh)
+        for key, kwargs in errors:
+            st.error(st.session_state.lang_manager.get_text(key, **kwargs))
+        return details
+    
+    @staticmethod
+    def fetch_games_details(game_ids: List[str], on_progress=None, fresh: bool = False,
+                            max_wait: float = INTERACTIVE_MAX_WAIT, parse=None) -> Tuple[Dict[str, Dict], List[Tuple[str, Dict]]]:
+        """画面表示なしの一括取得（裏のスレッドからも呼べる）- (ゲームID → 詳細, 失敗の一覧 [(エラーメッセージのキー, 引数)])
+
+        parse を渡すと <item> の変換をそれに任せる（既定は _parse_game_item、引数は <item>・ID・応答の取得日時）
+        """
+        parse = parse or BGGApi._parse_game_item
+        # 重複を除き、キャッシュキーが揃うよう並べる
+        game_ids = sorted(dict.fromkeys(str(game_id) for game_id in game_ids))
+        details = {}
+        errors = []
+        for start in range(0, len(game_ids), BGGApi.THING_BATCH_SIZE):
+            batch = game_ids[start:start + BGGApi.THING_BATCH_SIZE]
+            try:
+                params = {"id": ",".join(batch), "stats": "1"}
+                status_code, content, fetched_at = BGGApi._get("thing", params, timeout=15, fresh=fresh, max_wait=max_wait)
+                if status_code == 200:
+                    for item in BGGApi._iter_items(content):
+                        game_data = parse(item, item.get("id"), fetched_at)
+                        if game_data:
+                            details[game_data["id"]] = game_data
+                    BGGApi._remember([details[game_id] for game_id in batch if "names" in details.get(game_id, {})])
+                elif status_code == 202:
+                    # 再試行してもBGG側の準備が終わらなかった
+                    errors.append(("errors.bgg_no_response", {}))
+                else:
+                    errors.append(("errors.bgg_api_error", {"code": status_code}))
+            except requests.exceptions.Timeout:
+                errors.append(("errors.bgg_timeout", {}))
+            except ET.ParseError:
+                errors.append(("errors.bgg_parse_error", {}))
+            except Exception as e:
+                errors.append(("errors.game_detail_error", {"error": str(e)}))
+            
+            if on_progress:
+                on_progress(min(start + len(batch), len(game_ids)), len(game_ids))
+        return details, errors
+    
+    @staticmethod
+    def _get_thing(game_ids: List[str]) -> Tuple[bytes, datetime]:
+        """/thing の呼び出し - (本文, 応答の取得日時)。失敗時はエラー表示して (None, None)"""
+        params = {"id": ",".join(game_ids), "stats": "1"}
+        status_code, content, fetched_at = BGGApi._get("thing", params, timeout=15)
+        
+        if status_code == 200:
+            return content, fetched_at
+        if status_code == 202:
+            # 再試行してもBGG側の準備が終わらなかった
+            st.error(st.session_state.lang_manager.get_text("errors.bgg_no_response"))
+        else:
+            st.error(st.session_state.lang_manager.get_text("errors.bgg_api_error", code=status_code))
+        return None, None
+    
+    @staticmethod
+    def _parse_game_item(item, game_id: str, fetched_at: datetime = None) -> Dict:
+        """/thing の <item> 1件をゲームデータに変換（名前が無ければ空辞書）"""
+        # 全ての言語名を取得
+        names = BGGApi._extract_all_names(item)
+        
+        if not names.get("primary"):
+            return {}
+        
+        # 画像URLの取得
+        image_urls = BGGApi._extract_image_url(item)
+        
+        # その他の情報取得
+        minplayers_elem = item.find("minplayers")
+        min_players = minplayers_elem.get("value", "1") if minplayers_elem is not None else "1"
+        
+        maxplayers_elem = item.find("maxplayers")
+        max_players = maxplayers_elem.get("value", "4") if maxplayers_elem is not None else "4"
+        
+        playingtime_elem = item.find("playingtime")
+        playing_time = playingtime_elem.get("value", "60") if playingtime_elem is not None else "60"
+        
+        # 最適人数の取得
+        best_player_count = BGGApi.get_best_player_count(item)
+        
+        # 評価情報とランキング情報の取得
+        rating_info = BGGApi._extract_rating_and_ranking(item)
+
+        game_data = {
+            "id": game_id,
+            "names": names,  # 全言語名を保存
+            "name": names.get("primary", ""),  # 後方互換性のため
+            "image_url": image_urls["image_url"],
+            "thumbnail_url": image_urls["thumbnail_url"],
+            "min_players": str(min_players),
+            "max_players": str(max_players),
+            "playing_time": str(playing_time),
+            "best_player_count": best_player_count,
+            "rating": rating_info["rating"],
+            "ranking": rating_info["ranking"],  # ランキング情報を追加
+            "fetched_at": (fetched_at or datetime.now()).isoformat()  # 定期更新で古い順に取り直すための取得日時
+        }
+        
+        return game_data
+    
+    @staticmethod
+    def _parse_rating_item(item, game_id: str, fetched_at: datetime = None) -> Dict:
+        """/thing の <item> から評価・ランキングだけを取り出す（言語設定を使わないので裏のスレッド用）"""
+        return dict(BGGApi._extract_rating_and_ranking(item), id=game_id,
+                    fetched_at=(fetched_at or datetime.now()).isoformat())
+    
     @staticmethod
     def _extract_all_names(item) -> Dict:
         """全ての言語名を抽出"""
@@ -143,7 +312,7 @@ class BGGApi:
         name_candidates = []
         primary_name = ""
         
-        for name_elem in item.findall(".//name"):
+        for name_elem in item.findall("name"):
             name_value = name_elem.get("value", "")
             name_type = name_elem.get("type", "")
             
@@ -237,20 +406,20 @@ class BGGApi:
         return has_alpha
     
     @staticmethod
-    def _extract_image_url(item) -> str:
-        """画像URLの抽出"""
+    def _extract_image_url(item) -> Dict:
+        """画像URLとサムネイルURLの抽出"""
         image_url = ""
-        image_elem = item.find(".//image")
+        image_elem = item.find("image")
         if image_elem is not None and image_elem.text:
             image_url = image_elem.text.strip()
         
-        # サムネイルURLの取得（画像がない場合のフォールバック）
-        if not image_url:
-            thumbnail_elem = item.find(".//thumbnail")
-            if thumbnail_elem is not None and thumbnail_elem.text:
-                image_url = thumbnail_elem.text.strip()
+        thumbnail_url = ""
+        thumbnail_elem = item.find("thumbnail")
+        if thumbnail_elem is not None and thumbnail_elem.text:
+            thumbnail_url = thumbnail_elem.text.strip()
         
-        return image_url
+        # 画像がない場合はサムネイルで代用
+        return {"image_url": image_url or thumbnail_url, "thumbnail_url": thumbnail_url or image_url}
     
     @staticmethod
     def _extract_rating_and_ranking(item) -> Dict:
@@ -270,19 +439,19 @@ class BGGApi:
         }
         
         try:
-            stats_elem = item.find(".//statistics")
+            stats_elem = item.find("statistics")
             if stats_elem is not None:
-                ratings_elem = stats_elem.find(".//ratings")
+                ratings_elem = stats_elem.find("ratings")
                 if ratings_elem is not None:
                     # 評価の取得
-                    rating_elem = ratings_elem.find(".//average")
+                    rating_elem = ratings_elem.find("average")
                     if rating_elem is not None and rating_elem.get("value"):
                         rating_info["rating"] = float(rating_elem.get("value"))
                     
                     # ランキングの取得
-                    ranks_elem = ratings_elem.find(".//ranks")
+                    ranks_elem = ratings_elem.find("ranks")
                     if ranks_elem is not None:
-                        for rank_elem in ranks_elem.findall(".//rank"):
+                        for rank_elem in ranks_elem.findall("rank"):
                             rank_type = rank_elem.get("type", "")
                             rank_name = rank_elem.get("name", "")
                             rank_value = rank_elem.get("value", "")
@@ -322,14 +491,14 @@ class BGGApi:
         """最適人数を取得"""
         try:
             # プレイヤー数投票の取得
-            poll_elem = item.find(".//poll[@name='suggested_numplayers']")
+            poll_elem = item.find("poll[@name='suggested_numplayers']")
             if poll_elem is None:
                 return ""
             
             best_counts = []
             recommended_counts = []
             
-            for results in poll_elem.findall(".//results"):
+            for results in poll_elem.findall("results"):
                 numplayers = results.get("numplayers", "")
                 if not numplayers or numplayers == "":
                     continue
@@ -339,7 +508,7 @@ class BGGApi:
                 recommended_votes = 0
                 not_recommended_votes = 0
                 
-                for result in results.findall(".//result"):
+                for result in results.findall("result"):
                     value = result.get("value", "")
                     numvotes = int(result.get("numvotes", "0"))
                     
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# エンドポイントごとの鮮度（秒）- 検索結果は変わりやすく、詳細情報はあまり変わらない
+ENDPOINT_TTLS = {
+    "search": 24 * 60 * 60,
+    "thing": 7 * 24 * 60 * 60,
+}
+DEFAULT_TTL = 24 * 60 * 60
+# 鮮度切れでもこの期間内なら古い応答を返しつつ裏で再取得する
+STALE_WHILE_REVALIDATE = 30 * 24 * 60 * 60
+# キャッシュ全体の上限サイズ（超えたら最終参照の古いものから削除）
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+DEFAULT_CACHE_PATH = os.path.join("data", ".cache", "bgg_http.sqlite3")
+DEFAULT_BASE_URL = "https://boardgamegeek.com/xmlapi2"
+
+def cache_path_for(base_url: str) -> str:
+    """接続先ごとのキャッシュファイル（代替サーバーの応答を本番のキャッシュに混ぜない）"""
+    if base_url.rstrip("/") == DEFAULT_BASE_URL:
+        return DEFAULT_CACHE_PATH
+    digest = hashlib.sha256(base_url.encode('utf-8')).hexdigest()[:8]
+    return os.path.join(os.path.dirname(DEFAULT_CACHE_PATH), f"bgg_http-{digest}.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses(accessed_at);
+"""
+
+def cache_key(endpoint: str, params: Dict) -> str:
+    """エンドポイントとパラメータからキャッシュキーを作成（パラメータの順序に依存しない）"""
+    query = "&".join(f"{key}={params[key]}" for key in sorted(params))
+    return f"{endpoint}?{query}"
+
+class BGGResponseCache:
+    """BGG API応答のディスクキャッシュ（SQLite WAL - 複数セッション・プロセスで共有）"""
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def get(self, endpoint: str, params: Dict) -> Tuple[Optional[bytes], bool, Optional[float]]:
+        """キャッシュ済みの応答を取得（本文, 鮮度切れか, 取得時刻のUNIX時間）。使えなければ (None, False, None)"""
+        key = cache_key(endpoint, params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT body, fetched_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None, False, None
+            body, fetched_at = row
+            age = now - fetched_at
+            ttl = ENDPOINT_TTLS.get(endpoint, DEFAULT_TTL)
+            if age > ttl + STALE_WHILE_REVALIDATE:
+                return None, False, None
+            with self._conn:
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return bytes(body), age > ttl, fetched_at
+
+    def put(self, endpoint: str, params: Dict, body: bytes):
+        """応答を保存して上限サイズを超えた分を削除"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, body, size, fetched_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (cache_key(endpoint, params), endpoint, body, len(body), now, now)
+            )
+            self._evict()
+
+    def _evict(self):
+        """最終参照の古い順に削除（LRU）"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at")
+        expired = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            expired.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", expired)
+
+    def clear(self):
+        """キャッシュを全て削除"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict:
+        """件数と合計サイズ"""
+        with self._lock:
+            count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"entries": count, "bytes": size}
+
+    def close(self):
+        """接続を閉じる"""
+        with self._lock:
+            self._conn.close()
+
+# キャッシュファイルごとの共有インスタンス
+_shared_caches = {}
+_shared_caches_lock = threading.Lock()
+
+def get_response_cache(db_path: str = DEFAULT_CACHE_PATH) -> BGGResponseCache:
+    """キャッシュファイルごとにプロセス内で1つのBGGResponseCacheを取得"""
+    key = os.path.abspath(db_path)
+    with _shared_caches_lock:
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = BGGResponseCache(db_path)
+            _shared_caches[key] = cache
+        return cache
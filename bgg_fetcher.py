@@ -0,0 +1,80 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Tuple
+from bgg_api import BGGApi
+
+# 同時に実行するバッチ取得の数（送信レートは bgg_http のレート制限で抑える）
+DEFAULT_MAX_WORKERS = 4
+
+class DetailFetchJob:
+    """ゲーム詳細の並行取得ジョブ - THING_BATCH_SIZE 件ずつ1リクエストで取得し、完了したバッチから結果を返す（途中でキャンセル可）"""
+
+    def __init__(self, game_ids: List[str], max_workers: int = DEFAULT_MAX_WORKERS,
+                 fetch: Callable[[List[str]], Tuple[Dict[str, Dict], List[Tuple[str, Dict]]]] = BGGApi.fetch_games_details,
+                 batch_size: int = BGGApi.THING_BATCH_SIZE):
+        self.game_ids = list(dict.fromkeys(str(game_id) for game_id in game_ids))
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self._fetch = fetch
+        self._cancelled = threading.Event()
+        self._executor = None
+        self._futures = {}
+        # 取得できなかったバッチのエラー [(エラーメッセージのキー, 引数)]（表示は呼び出し側）
+        self.errors = []
+
+    def start(self) -> "DetailFetchJob":
+        """取得を開始"""
+        # get_games_details と同じ並びで区切り、応答キャッシュのキーを揃える
+        game_ids = sorted(self.game_ids)
+        batches = [game_ids[start:start + self.batch_size] for start in range(0, len(game_ids), self.batch_size)]
+        # 取得処理は画面表示をしないので、ワーカースレッドにStreamlitの実行コンテキストは不要
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bgg-fetch")
+        self._futures = {self._executor.submit(self._run, batch): batch for batch in batches}
+        return self
+
+    def _run(self, batch: List[str]) -> Tuple[Dict[str, Dict], List[Tuple[str, Dict]]]:
+        if self._cancelled.is_set():
+            return {}, []
+        return self._fetch(batch)
+
+    def results(self) -> Iterator[Tuple[str, Dict]]:
+        """完了したバッチごとに (ゲームID, 詳細) を返す（取得失敗・キャンセル分は空辞書）"""
+        if self._executor is None:
+            self.start()
+        try:
+            for future in as_completed(self._futures):
+                if self._cancelled.is_set():
+                    return
+                batch = self._futures[future]
+                try:
+                    details, errors = future.result()
+                except Exception as e:
+                    details, errors = {}, [("errors.game_detail_error", {"error": str(e)})]
+                self.errors.extend(errors)
+                for game_id in batch:
+                    yield game_id, details.get(game_id, {})
+        finally:
+            # 途中で止められた（Streamlitの再実行など）場合も残りを取り消す
+            self.cancel()
+
+    def cancel(self):
+        """未実行の取得を取り消す（実行中のリクエストは完了を待たない）"""
+        self._cancelled.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+def fetch_games_details(game_ids: List[str], on_result: Callable[[str, Dict, int, int], None] = None,
+                        max_workers: int = DEFAULT_MAX_WORKERS) -> Dict[str, Dict]:
+    """複数ゲームの詳細をバッチ単位で並行取得 - 1件ごとに on_result(ゲームID, 詳細, 完了数, 総数)"""
+    job = DetailFetchJob(game_ids, max_workers)
+    details = {}
+    for done, (game_id, game_data) in enumerate(job.results(), start=1):
+        if game_data:
+            details[game_id] = game_data
+        if on_result:
+            on_result(game_id, game_data, done, len(job.game_ids))
+    return details
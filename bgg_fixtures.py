@@ -0,0 +1,73 @@
+import hashlib
+import os
+import tempfile
+from typing import Dict, List
+from xml.sax.saxutils import quoteattr
+from bgg_cache import cache_key
+
+# 記録した BGG API 応答の保存先（bgg_stub_server が再生する）
+DEFAULT_FIXTURE_DIR = os.path.join("fixtures", "bgg")
+
+def fixture_path(fixture_dir: str, endpoint: str, params: Dict) -> str:
+    """応答を保存するファイルのパス（キャッシュと同じキーのハッシュ）"""
+    digest = hashlib.sha256(cache_key(endpoint, params).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(fixture_dir, endpoint, f"{digest}.xml")
+
+def record_response(fixture_dir: str, endpoint: str, params: Dict, body: bytes):
+    """BGG API の応答を記録"""
+    path = fixture_path(fixture_dir, endpoint, params)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(body)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def load_fixture(fixture_dir: str, endpoint: str, params: Dict) -> bytes:
+    """記録済みの応答（無ければNone）"""
+    try:
+        with open(fixture_path(fixture_dir, endpoint, params), 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+def synthetic_search_xml(query: str, items: int) -> bytes:
+    """/search 応答相当の合成XML"""
+    rows = "".join(
+        f'<item type="boardgame" id="{i + 1}"><name type="primary" value={quoteattr(f"{query} {i + 1}")}/>'
+        f'<yearpublished value="{1990 + i % 35}"/></item>'
+        for i in range(items)
+    )
+    return (f'<?xml version="1.0" encoding="utf-8"?>'
+            f'<items total="{items}" termsofuse="https://boardgamegeek.com/xmlapi/termsofuse">{rows}</items>').encode('utf-8')
+
+def synthetic_thing_item(game_id: str) -> str:
+    """/thing?stats=1 の <item> 1件分（投票・ランキング付き）"""
+    i = int(game_id) if str(game_id).isdigit() else len(str(game_id))
+    results = "".join(
+        f'<results numplayers="{n}"><result value="Best" numvotes="{(i + n) % 40}"/>'
+        f'<result value="Recommended" numvotes="{(i * n) % 30}"/><result value="Not Recommended" numvotes="{n * 3}"/></results>'
+        for n in range(1, 7)
+    )
+    return (
+        f'<item type="boardgame" id="{game_id}"><thumbnail>https://example.invalid/t{game_id}.jpg</thumbnail>'
+        f'<image>https://example.invalid/{game_id}.jpg</image>'
+        f'<name type="primary" sortindex="1" value="Game {game_id}"/><name type="alternate" sortindex="1" value="ゲーム{game_id}"/>'
+        f'<description>{"Lorem ipsum dolor sit amet. " * 20}</description><yearpublished value="2001"/>'
+        f'<minplayers value="2"/><maxplayers value="5"/>'
+        f'<poll name="suggested_numplayers" title="User Suggested Number of Players" totalvotes="120">{results}</poll>'
+        f'<playingtime value="60"/>'
+        f'<statistics page="1"><ratings><usersrated value="1000"/><average value="7.{i % 10}"/>'
+        f'<ranks><rank type="subtype" id="1" name="boardgame" friendlyname="Board Game Rank" value="{i + 1}"/>'
+        f'<rank type="family" id="5497" name="strategygames" friendlyname="Strategy Game Rank" value="{i + 2}"/></ranks>'
+        f'</ratings></statistics></item>'
+    )
+
+def synthetic_thing_xml(game_ids: List[str]) -> bytes:
+    """/thing?stats=1 応答相当の合成XML"""
+    rows = "".join(synthetic_thing_item(game_id) for game_id in game_ids)
+    return f'<?xml version="1.0" encoding="utf-8"?><items termsofuse="https://boardgamegeek.com/xmlapi/termsofuse">{rows}</items>'.encode('utf-8')
@@ -0,0 +1,97 @@
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Dict
+
+# BGG API への送信レート（プロセス全体で共有）
+REQUESTS_PER_SECOND = 2.0
+BURST = 4
+
+# 再試行するステータス（202はBGG側でキュー処理中）
+RETRY_STATUS_CODES = {202, 429, 500, 502, 503, 504}
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 2.0   # 秒（試行ごとに倍）
+BACKOFF_MAX = 30.0
+# 1回の呼び出しで再試行に使う時間の上限（秒）
+# 画面操作からの呼び出しはスクリプトを止めるので短く、裏のスレッドからの呼び出しだけ長く待つ
+INTERACTIVE_MAX_WAIT = 8.0
+BACKGROUND_MAX_WAIT = 120.0
+
+USER_AGENT = "TabletopTracker"
+
+class TokenBucket:
+    """トークンバケット方式のレート制限（スレッドセーフ）"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """トークンを1つ取得（足りなければ補充まで待機）- 待機秒数を返す"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # 先に予約してからロック外で待つ（待機中も他スレッドが順番を取れる）
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+rate_limiter = TokenBucket(REQUESTS_PER_SECOND, BURST)
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """接続を使い回す共有セッション（keep-alive・コネクションプール）"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            _session = session
+        return _session
+
+def backoff_delay(attempt: int, retry_after: str = None) -> float:
+    """再試行までの待機秒数（指数バックオフ + ジッター、Retry-After があれば優先）"""
+    if retry_after and retry_after.strip().isdigit():
+        return min(float(retry_after), BACKOFF_MAX)
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+    # 半分は固定、残り半分をランダムにして同時に再試行しないようにする
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def get_with_retries(url: str, params: Dict, timeout: float, max_wait: float = INTERACTIVE_MAX_WAIT) -> requests.Response:
+    """レート制限・再試行付きGET（最後の応答を返す。通信エラーが続けば例外）
+
+    再試行の待機が max_wait 秒を超える場合は待たずにその時点の結果を返す
+    """
+    session = get_session()
+    deadline = time.monotonic() + max_wait
+    response = None
+    for attempt in range(MAX_ATTEMPTS):
+        rate_limiter.acquire()
+        try:
+            response = session.get(url, params=params, timeout=timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            delay = backoff_delay(attempt)
+            if attempt == MAX_ATTEMPTS - 1 or time.monotonic() + delay > deadline:
+                raise
+            time.sleep(delay)
+            continue
+        if response.status_code not in RETRY_STATUS_CODES or attempt == MAX_ATTEMPTS - 1:
+            return response
+        delay = backoff_delay(attempt, response.headers.get("Retry-After"))
+        if time.monotonic() + delay > deadline:
+            return response
+        time.sleep(delay)
+    return response
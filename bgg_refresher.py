@@ -0,0 +1,117 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List
+from bgg_api import BGGApi
+from bgg_http import BACKGROUND_MAX_WAIT
+from yaml_store import file_lock
+
+# 取得からこの期間を過ぎたゲームの評価・ランキングを取り直す
+DEFAULT_MAX_AGE = timedelta(days=7)
+# 古いゲームを確認する間隔（秒）
+DEFAULT_INTERVAL = 60 * 60
+# 起動直後は画面表示を優先し、少し待ってから最初の更新を行う（秒）
+DEFAULT_INITIAL_DELAY = 60
+# 1回の更新で取り直す最大件数（古い順）
+DEFAULT_LIMIT = 200
+# 定期更新で上書きする項目（名前・画像などはユーザーの「情報を更新」で取り直す）
+REFRESH_FIELDS = ("rating", "ranking", "fetched_at")
+
+def stale_game_ids(games: Dict[str, Dict], max_age: timedelta = DEFAULT_MAX_AGE,
+                   now: datetime = None, limit: int = None) -> List[str]:
+    """取得日時が古い（または記録が無い）ゲームのIDを古い順に返す"""
+    now = now or datetime.now()
+    stale = []
+    for game_id, game in games.items():
+        if not str(game_id).isdigit():
+            continue  # BGG以外から登録したゲーム
+        try:
+            fetched_at = datetime.fromisoformat(game.get("fetched_at", ""))
+        except (TypeError, ValueError):
+            fetched_at = datetime.min
+        if now - fetched_at >= max_age:
+            stale.append((fetched_at, game_id))
+    stale.sort()
+    return [game_id for _, game_id in stale[:limit]]
+
+def refresh_stale_games(data_manager, max_age: timedelta = DEFAULT_MAX_AGE, limit: int = DEFAULT_LIMIT) -> int:
+    """古いゲームの評価・ランキングをまとめて取り直し、1回の書き込みで保存 - 更新件数を返す"""
+    # 複数プロセスで同時に動いても、同じゲームを重ねて取りに行かない
+    os.makedirs(data_manager.cache_dir, exist_ok=True)
+    with file_lock(os.path.join(data_manager.cache_dir, "bgg_refresh")):
+        with data_manager.lock:
+            data_manager.refresh_if_stale("games")
+            game_ids = stale_game_ids(data_manager.data.get("games") or {}, max_age, limit=limit)
+        if not game_ids:
+            return 0
+
+        # キャッシュを通さずに最新の値を取得（取得した応答はキャッシュにも入る）
+        # 画面の無いスレッドなのでエラー表示はせず、取れなかった分は次回に回す
+        details, _ = BGGApi.fetch_games_details(game_ids, fresh=True, max_wait=BACKGROUND_MAX_WAIT,
+                                                parse=BGGApi._parse_rating_item)
+        updates = {}
+        for game_id, game_data in details.items():
+            updates[game_id] = {field: game_data[field] for field in REFRESH_FIELDS if field in game_data}
+
+        if not updates:
+            return 0
+        return data_manager.update_games(updates)
+
+class RankingRefresher:
+    """評価・ランキングの定期更新 - リクエスト処理とは別のデーモンスレッドで動く"""
+
+    def __init__(self, data_manager, max_age: timedelta = DEFAULT_MAX_AGE, interval: float = DEFAULT_INTERVAL,
+                 initial_delay: float = DEFAULT_INITIAL_DELAY, limit: int = DEFAULT_LIMIT):
+        self.dm = data_manager
+        self.max_age = max_age
+        self.interval = interval
+        self.initial_delay = initial_delay
+        self.limit = limit
+        self.last_run = None
+        self.last_updated = 0
+        self.last_errors = []  # 直近の更新で起きた保存・読み込みエラー [(言語キー, 引数)]
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> "RankingRefresher":
+        """定期更新を開始（既に動いていれば何もしない）"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="bgg-refresh", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """定期更新を停止"""
+        self._stop.set()
+
+    def run_once(self) -> int:
+        """古いゲームを1回更新 - 更新件数を返す"""
+        # 画面の無いスレッドなので、データ保存のエラーは表示せずに記録する
+        with self.dm.collect_errors() as errors:
+            self.last_updated = refresh_stale_games(self.dm, self.max_age, self.limit)
+        self.last_errors = errors
+        self.last_run = datetime.now()
+        return self.last_updated
+
+    def _loop(self):
+        wait = self.initial_delay
+        while not self._stop.wait(wait):
+            try:
+                self.run_once()
+            except Exception:
+                pass  # BGGやデータファイルの一時的な失敗は次回に持ち越す
+            wait = self.interval
+
+_refreshers = {}
+_refreshers_lock = threading.Lock()
+
+def start_ranking_refresher(data_manager) -> RankingRefresher:
+    """DataManagerごとにプロセス内で1つの定期更新を開始（TABLETOP_BGG_REFRESH=0 で無効）"""
+    if os.environ.get("TABLETOP_BGG_REFRESH") == "0":
+        return None
+    with _refreshers_lock:
+        refresher = _refreshers.get(id(data_manager))
+        if refresher is None:
+            refresher = _refreshers[id(data_manager)] = RankingRefresher(data_manager)
+        return refresher.start()
@@ -0,0 +1,162 @@
+"""BGG XML API のローカル代替サーバー（記録済み応答の再生・オフライン検証用）
+
+使い方:
+    python bgg_stub_server.py --port 8765 --latency 0.2 --queue 1 --rate-limit 5 --synthetic
+    TABLETOP_BGG_BASE_URL=http://127.0.0.1:8765/xmlapi2 streamlit run main.py
+"""
+import argparse
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+from bgg_fixtures import DEFAULT_FIXTURE_DIR, load_fixture, synthetic_search_xml, synthetic_thing_item, synthetic_thing_xml
+from bgg_cache import cache_key
+
+class StubBehavior:
+    """代替サーバーの応答設定"""
+
+    def __init__(self, fixture_dir: str = DEFAULT_FIXTURE_DIR, latency: float = 0.0, queue: int = 0,
+                 rate_limit: float = 0.0, synthetic: bool = False, search_items: int = 50):
+        self.fixture_dir = fixture_dir
+        self.latency = latency          # 応答ごとの遅延（秒）
+        self.queue = queue              # 同じ /thing リクエストに202を返す回数（BGGの処理待ちを再現）
+        self.rate_limit = rate_limit    # 1秒あたりの上限（超えたら429）。0なら無制限
+        self.synthetic = synthetic      # 記録が無いリクエストに合成データを返す
+        self.search_items = search_items
+        self.requests = 0
+        self.status_counts = {}
+        self._queued = {}
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def admit(self, endpoint: str, params: Dict) -> int:
+        """応答前の判定（429・202を返すならそのステータス、通常は200）"""
+        with self._lock:
+            self.requests += 1
+            now = time.monotonic()
+            if self.rate_limit:
+                while self._recent and now - self._recent[0] > 1.0:
+                    self._recent.popleft()
+                if len(self._recent) >= self.rate_limit:
+                    return 429
+                self._recent.append(now)
+            if endpoint == "thing" and self.queue:
+                key = cache_key(endpoint, params)
+                seen = self._queued.get(key, 0)
+                if seen < self.queue:
+                    self._queued[key] = seen + 1
+                    return 202
+        return 200
+
+    def count(self, status: int):
+        with self._lock:
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+    def body(self, endpoint: str, params: Dict) -> bytes:
+        """応答本文（記録済みの応答を優先）"""
+        recorded = load_fixture(self.fixture_dir, endpoint, params)
+        if recorded is not None:
+            return recorded
+        if endpoint == "search":
+            if self.synthetic:
+                return synthetic_search_xml(params.get("query", ""), self.search_items)
+            return b'<?xml version="1.0" encoding="utf-8"?><items total="0"></items>'
+        return self._thing_body(params)
+
+    def _thing_body(self, params: Dict) -> bytes:
+        """複数IDの /thing を1件ずつの記録から組み立てる"""
+        game_ids = [game_id for game_id in params.get("id", "").split(",") if game_id]
+        items = []
+        for game_id in game_ids:
+            item = self._recorded_thing_item(game_id, params)
+            if item is None and self.synthetic:
+                item = synthetic_thing_item(game_id)
+            if item is not None:
+                items.append(item)
+        if not items and self.synthetic:
+            return synthetic_thing_xml(game_ids)
+        return ('<?xml version="1.0" encoding="utf-8"?><items termsofuse="https://boardgamegeek.com/xmlapi/termsofuse">'
+                + "".join(items) + "</items>").encode('utf-8')
+
+    def _recorded_thing_item(self, game_id: str, params: Dict) -> str:
+        single = dict(params, id=game_id)
+        recorded = load_fixture(self.fixture_dir, "thing", single)
+        if recorded is None:
+            return None
+        item = ET.fromstring(recorded).find("item")
+        return ET.tostring(item, encoding="unicode") if item is not None else None
+
+def _make_handler(behavior: StubBehavior):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            endpoint = url.path.rstrip("/").rsplit("/", 1)[-1]
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            if behavior.latency:
+                time.sleep(behavior.latency)
+
+            if endpoint not in ("search", "thing"):
+                return self._send(404, b"")
+            status = behavior.admit(endpoint, params)
+            if status == 429:
+                return self._send(429, b"<error><message>Rate limit exceeded.</message></error>", {"Retry-After": "1"})
+            if status == 202:
+                return self._send(202, b"")
+            self._send(200, behavior.body(endpoint, params))
+
+        def _send(self, status: int, body: bytes, headers: Dict = None):
+            behavior.count(status)
+            self.send_response(status)
+            self.send_header("Content-Type", "text/xml; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # リクエストごとのログは出さない
+
+    return StubHandler
+
+def start_stub_server(behavior: StubBehavior = None, host: str = "127.0.0.1", port: int = 0):
+    """代替サーバーを別スレッドで起動（サーバー, ベースURL）- port=0 なら空きポート"""
+    behavior = behavior or StubBehavior()
+    server = ThreadingHTTPServer((host, port), _make_handler(behavior))
+    server.daemon_threads = True
+    server.behavior = behavior
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}/xmlapi2"
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the BGG XML API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURE_DIR, help="directory of recorded responses")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before each response")
+    parser.add_argument("--queue", type=int, default=0, help="answer each /thing request with 202 this many times first")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="requests per second before answering 429")
+    parser.add_argument("--synthetic", action="store_true", help="generate responses for requests that were not recorded")
+    parser.add_argument("--search-items", type=int, default=50, help="items in a synthetic /search response")
+    args = parser.parse_args(argv)
+
+    behavior = StubBehavior(args.fixtures, args.latency, args.queue, args.rate_limit, args.synthetic, args.search_items)
+    server, base_url = start_stub_server(behavior, args.host, args.port)
+    print(f"Serving BGG stand-in at {base_url}")
+    print(f"  TABLETOP_BGG_BASE_URL={base_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        print(f"requests: {behavior.requests}  statuses: {behavior.status_counts}")
+
+if __name__ == "__main__":
+    main()
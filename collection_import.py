@@ -0,0 +1,124 @@
+import io
+import json
+import os
+import re
+import tempfile
+import xml.etree.ElementTree as ET
+from typing import Callable, Dict, List, Tuple
+from bgg_api import BGGApi
+
+def parse_collection_ids(content: bytes, owned_only: bool = True) -> List[str]:
+    """BGGコレクションXML（/collection の応答・エクスポート）からボードゲームのIDを取得"""
+    game_ids = []
+    root = None
+    for event, elem in ET.iterparse(io.BytesIO(content), events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+            continue
+        if elem.tag != "item":
+            continue
+        if elem.get("subtype", "boardgame") == "boardgame" and elem.get("objectid"):
+            status = elem.find("status")
+            if not owned_only or status is None or status.get("own") == "1":
+                game_ids.append(elem.get("objectid"))
+        root.clear()
+    return list(dict.fromkeys(game_ids))
+
+def parse_id_list(text: str) -> List[str]:
+    """カンマ・空白・改行区切りのIDリスト（BGGのURLも可）からIDを取得"""
+    game_ids = []
+    for token in re.split(r"[\s,;]+", text or ""):
+        match = re.search(r"boardgame/(\d+)", token) or re.fullmatch(r"(\d+)", token)
+        if match:
+            game_ids.append(match.group(1))
+    return list(dict.fromkeys(game_ids))
+
+class CollectionImportJob:
+    """コレクション一括取り込み - 詳細はまとめて取得し、最後に1回だけ保存。中断しても再開できる"""
+
+    STATE_FILENAME = "collection_import.json"
+
+    def __init__(self, data_manager, state_path: str = None):
+        self.dm = data_manager
+        self.state_path = state_path or os.path.join(data_manager.cache_dir, self.STATE_FILENAME)
+        self.state = self._load_state()
+
+    @property
+    def pending(self) -> List[str]:
+        return self.state["pending"]
+
+    @property
+    def fetched(self) -> Dict[str, Dict]:
+        return self.state["fetched"]
+
+    @property
+    def failed(self) -> List[str]:
+        return self.state["failed"]
+
+    def has_unfinished(self) -> bool:
+        """途中で止まった取り込みがあるか"""
+        return bool(self.pending or self.fetched)
+
+    def start(self, game_ids: List[str]) -> int:
+        """取り込みを登録（登録済みのゲームは除外）- 取り込み対象の件数を返す"""
+        registered = self.dm.data.get("games") or {}
+        pending = [game_id for game_id in dict.fromkeys(str(g) for g in game_ids) if game_id not in registered]
+        self.state = {"pending": pending, "fetched": {}, "failed": []}
+        self._save_state()
+        return len(pending)
+
+    def run(self, on_progress: Callable[[int, int], None] = None) -> Tuple[List[str], List[str]]:
+        """残りの詳細を取得して新しいゲームをまとめて保存 - (追加したゲームID, 取得できなかったゲームID)
+
+        保存に失敗した場合は追加したゲームIDがNone（取得結果は残し、再開で保存し直せる）
+        """
+        total = len(self.pending) + len(self.fetched) + len(self.failed)
+        while self.pending:
+            batch = self.pending[:BGGApi.THING_BATCH_SIZE]
+            details = BGGApi.get_games_details(batch)
+            for game_id in batch:
+                if details.get(game_id):
+                    self.fetched[game_id] = details[game_id]
+                else:
+                    self.failed.append(game_id)
+            del self.pending[:len(batch)]
+            # バッチごとに進捗を保存（中断したらここから再開）
+            self._save_state()
+            if on_progress:
+                on_progress(total - len(self.pending), total)
+
+        added = self.dm.add_games(list(self.fetched.values()))
+        failed = list(self.failed)
+        if added is None:
+            return None, failed
+        self.discard()
+        return added, failed
+
+    def discard(self):
+        """取り込み状態を破棄"""
+        self.state = {"pending": [], "fetched": {}, "failed": []}
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+    def _load_state(self) -> Dict:
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            return {"pending": state.get("pending", []), "fetched": state.get("fetched", {}), "failed": state.get("failed", [])}
+        except (OSError, ValueError):
+            return {"pending": [], "fetched": {}, "failed": []}
+
+    def _save_state(self):
+        """状態ファイルを一時ファイル経由で置き換え"""
+        directory = os.path.dirname(self.state_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, ensure_ascii=False)
+            os.replace(temp_path, self.state_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
@@ -1,16 +1,44 @@
 import streamlit as st
-import yaml
+import json
 import os
+import threading
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
 from typing import Dict, List
+from sqlite_storage import SQLiteStorage, migrate_yaml_to_sqlite
+from head_to_head import HeadToHead
+from lazy_datasets import LazyDatasets
+from play_frames import PlayFrames
+from play_index import PlayIndex
+from rating_engine import RatingEngine
+from win_rate_intervals import WinRateIntervals
+from utils import ensure_play_result_fields, play_result_fields
+from yaml_store import ChecksumMismatchError, backup_path, file_lock, file_signature, read_header, read_yaml_file, write_yaml_file
+
+# データタイプごとの空データ
+DATASET_DEFAULTS = {"games": dict, "players": dict, "plays": list, "score_sheets": dict}
+
+# 保存バックエンドの選択（"yaml" または "sqlite"）
+STORAGE_BACKEND_ENV = "TABLETOP_STORAGE_BACKEND"
+
+# ジャーナルに溜まった件数がこれを超えたらスナップショットへ統合
+PLAYS_JOURNAL_COMPACT_THRESHOLD = 100
 
 class DataManager:
     """データ管理クラス - 分離されたファイル管理"""
     
-    def __init__(self, data_dir="data"):
+    def __init__(self, data_dir="data", use_plays_journal=True, backend=None):
         self.data_dir = data_dir
+        self.use_plays_journal = use_plays_journal
+        self.backend = backend or os.environ.get(STORAGE_BACKEND_ENV, "yaml")
+        # 複数セッションから共有されるため書き込みはこのロックで直列化
+        self.lock = threading.RLock()
+        # エラーを画面に出さずに集めているスレッド（collect_errors）ごとの記録先
+        self._error_sinks = threading.local()
         # データディレクトリを作成
         os.makedirs(data_dir, exist_ok=True)
+        # 派生データ・キャッシュの置き場所（削除しても再生成される）
+        self.cache_dir = os.path.join(data_dir, ".cache")
         
         # 各データファイルのパス
         self.files = {
@@ -20,70 +48,599 @@ class DataManager:
             "score_sheets": os.path.join(data_dir, "score_sheets.yaml")
         }
         
-        # データを読み込み
+        # プレイ記録の追記専用ジャーナル（1行1レコードのJSON）
+        self.plays_journal_file = os.path.join(data_dir, "plays.journal")
+        self.journal_count = 0
+        self.plays_journal_size = 0  # 読み込み済みのバイト数（他プロセスの追記検出用）
+        
+        # 統計用の列指向データ（追加されたプレイの行だけを足し、cache_dir に保存して起動時に再利用）
+        self.play_frames_file = os.path.join(self.cache_dir, "play_frames.pickle")
+        self._play_frames = None
+        self._play_frames_source = None
+        self._head_to_head = None
+        self._head_to_head_source = None
+        self._win_rate_intervals = {}
+        self._win_rate_intervals_source = None
+        
+        # レーティング（新しいプレイは差分更新、過去の記録が変わったときだけ再計算）
+        self.ratings_file = os.path.join(self.cache_dir, "ratings.json")
+        self.ratings_history_file = os.path.join(self.cache_dir, "ratings_history.jsonl")
+        self.ratings = None
+        self._ratings_history = None  # 推移グラフを表示するときに読み込み
+        
+        # SQLiteバックエンド（初回はYAMLから自動移行）
+        self.storage = None
+        if self.backend == "sqlite":
+            db_path = os.path.join(data_dir, SQLiteStorage.DB_FILENAME)
+            if not os.path.exists(db_path):
+                migrate_yaml_to_sqlite(data_dir, db_path)
+            self.storage = SQLiteStorage(db_path)
+            self.storage_version = self.storage.data_version()
+        
+        # ファイルごとの世代番号（保存のたびに増える）
+        self.generations = {}
+        # 解析済みYAMLのバイナリキャッシュ（cache_dir、YAMLが変わっていなければ起動時に使用）
+        # 最後に読み書きした時点のファイル署名（他セッション・他プロセスの変更検出用）
+        self.file_signatures = {}
+        
+        # データは各データタイプの初回アクセス時に読み込む
+        self._play_index = None
+        self._next_play_id = 0
         self.data = self.load_all_data()
     
     def load_file(self, file_path: str, default_value) -> any:
         """個別ファイル読み込み"""
+        # 読み込み前に記録（読み込み中に変わった場合は次回の確認で再読み込みされる）
+        self.file_signatures[file_path] = file_signature(file_path)
+        if not os.path.exists(file_path):
+            return default_value
         try:
-            if os.path.exists(file_path):
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = yaml.safe_load(f)
-                    return data if data is not None else default_value
+            data = self._read_yaml(file_path)
+            return data if data is not None else default_value
         except Exception as e:
-            st.error(st.session_state.lang_manager.get_text("errors.file_load_error", path=file_path, error=str(e)))
+            self._report("error", "errors.file_load_error", path=file_path, error=str(e))
+        
+        # 読めない場合は空データで上書きしないよう直前の世代から復旧
+        previous_path = backup_path(file_path)
+        if os.path.exists(previous_path):
+            try:
+                data = self._read_yaml(previous_path, file_path)
+                self._report("warning", "errors.file_restored_from_backup", path=previous_path)
+                return data if data is not None else default_value
+            except Exception as e:
+                self._report("error", "errors.file_load_error", path=previous_path, error=str(e))
         return default_value
     
-    def save_file(self, file_path: str, data: any):
-        """個別ファイル保存"""
+    def _read_yaml(self, read_path: str, file_path: str = None) -> any:
+        """YAML読み込みと世代番号の記録"""
+        file_path = file_path or read_path
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                yaml.dump(data, f, allow_unicode=True, default_flow_style=False)
+            # 直前の世代（.bak）から復旧する場合はキャッシュを使わない
+            cache_path = self.cache_path(file_path) if read_path == file_path else None
+            data, generation = read_yaml_file(read_path, cache_path)
+        except ChecksumMismatchError as e:
+            # 解析できた内容はアプリ外での編集とみなして使用
+            self._report("warning", "errors.file_checksum_mismatch", path=read_path)
+            data, generation = e.data, e.generation
+        self.generations[file_path] = max(self.generations.get(file_path, 0), generation)
+        return data
+    
+    def cache_path(self, file_path: str) -> str:
+        """データファイルに対応するバイナリキャッシュのパス"""
+        return os.path.join(self.cache_dir, f"{os.path.basename(file_path)}.pickle")
+    
+    def save_file(self, file_path: str, data: any) -> bool:
+        """個別ファイル保存（一時ファイル経由のアトミックな置き換え）"""
+        try:
+            generation = max(self.generations.get(file_path, 0), read_header(file_path).get("generation", 0)) + 1
+            write_yaml_file(file_path, data, generation, self.cache_path(file_path))
+            self.generations[file_path] = generation
+            self.file_signatures[file_path] = file_signature(file_path)
+            return True
         except Exception as e:
-            st.error(st.session_state.lang_manager.get_text("errors.file_save_error", path=file_path, error=str(e)))
+            self._report("error", "errors.file_save_error", path=file_path, error=str(e))
+        return False
     
-    def load_all_data(self) -> Dict:
-        """全データ読み込み"""
-        return {
-            "games": self.load_file(self.files["games"], {}),
-            "players": self.load_file(self.files["players"], {}),
-            "plays": self.load_file(self.files["plays"], []),
-            "score_sheets": self.load_file(self.files["score_sheets"], {})
-        }
+    @contextmanager
+    def collect_errors(self):
+        """このスレッドでのエラーを画面に出さずに集める（画面の無いスレッド用）- [(言語キー, 引数)]"""
+        errors = []
+        previous = getattr(self._error_sinks, "errors", None)
+        self._error_sinks.errors = errors
+        try:
+            yield errors
+        finally:
+            self._error_sinks.errors = previous
+    
+    def _report(self, level: str, key: str, **kwargs):
+        """エラー・警告の表示（collect_errors 中は表示せずに記録）"""
+        errors = getattr(self._error_sinks, "errors", None)
+        if errors is not None:
+            errors.append((key, kwargs))
+            return
+        getattr(st, level)(st.session_state.lang_manager.get_text(key, **kwargs))
+    
+    def dataset_lock(self, data_type: str, exclusive: bool = True):
+        """データタイプ単位のプロセス間ロック（SQLiteはDB自身のロックを使用）"""
+        if self.storage:
+            return nullcontext()
+        return file_lock(self.files[data_type], exclusive)
+    
+    def is_stale(self, data_type: str) -> bool:
+        """ディスク上のデータが読み込み時点から変わったか（stat の inode・サイズ・mtime で判定）"""
+        if self.storage or not self.data.is_loaded(data_type):
+            return False  # 未読み込みのデータは次回アクセス時に最新を読む
+        paths = [self.files[data_type]]
+        if data_type == "plays":
+            paths.append(self.plays_journal_file)
+        return any(file_signature(path) != self.file_signatures.get(path) for path in paths)
+    
+    def reload_dataset(self, data_type: str):
+        """データタイプをディスクから再読み込み（次回アクセス時）"""
+        with self.lock:
+            self.data.unload(data_type)
+    
+    def refresh_if_stale(self, data_type: str) -> bool:
+        """古くなっていれば再読み込み（ジャーナルへの追記のみなら差分だけ反映）"""
+        with self.lock:
+            if not self.is_stale(data_type):
+                return False
+            if data_type == "plays" and self._is_journal_append_only():
+                self._catch_up_plays_journal()
+            else:
+                self.reload_dataset(data_type)
+            return True
+    
+    def refresh(self) -> List[str]:
+        """変更されたデータタイプのみ再読み込み（Streamlitの再実行ごとに呼ぶ）"""
+        with self.lock:
+            if self.storage:
+                # 他の接続がコミットした場合のみ全体を読み直す
+                version = self.storage.data_version()
+                if version == self.storage_version:
+                    return []
+                self.storage_version = version
+                self.data.unload()
+                return list(self.files)
+            return [data_type for data_type in self.files if self.refresh_if_stale(data_type)]
+    
+    def _is_journal_append_only(self) -> bool:
+        """スナップショットは変わらず、ジャーナルに追記されただけか"""
+        snapshot_path = self.files["plays"]
+        if file_signature(snapshot_path) != self.file_signatures.get(snapshot_path):
+            return False
+        current = file_signature(self.plays_journal_file)
+        recorded = self.file_signatures.get(self.plays_journal_file)
+        if current is None:
+            return False
+        if recorded is None:
+            return self.plays_journal_size == 0
+        return current[0] == recorded[0] and current[1] >= self.plays_journal_size
+    
+    def _catch_up_plays_journal(self):
+        """ジャーナルの未読部分のみ読み込んでプレイ記録に反映"""
+        signature = file_signature(self.plays_journal_file)
+        try:
+            with open(self.plays_journal_file, 'rb') as f:
+                f.seek(self.plays_journal_size)
+                raw = f.read()
+        except OSError as e:
+            self._report("error", "errors.file_load_error", path=self.plays_journal_file, error=str(e))
+            return
+        
+        # 書き込み途中の末尾行は次回に回す
+        complete = raw[:raw.rfind(b"\n") + 1]
+        self.plays_journal_size += len(complete)
+        self.file_signatures[self.plays_journal_file] = signature
+        
+        for line in complete.splitlines():
+            try:
+                play = json.loads(line) if line.strip() else None
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue
+            if play is None or self.play_index.get(play.get("id")) is not None:
+                continue
+            ensure_play_result_fields(play)
+            self.journal_count += 1
+            self.data["plays"].append(play)
+            self.play_index.add(play)
+            if isinstance(play.get("id"), int):
+                self.next_play_id = max(self.next_play_id, play["id"] + 1)
+    
+    def load_all_data(self) -> LazyDatasets:
+        """全データ（各データタイプは初回アクセス時に読み込み）"""
+        return LazyDatasets(self.load_dataset, self.files, self.lock)
+    
+    def load_dataset(self, data_type: str) -> any:
+        """データタイプ1つ分の読み込み"""
+        if self.storage:
+            try:
+                value = self.storage.load_dataset(data_type)
+            except Exception as e:
+                self._report("error", "errors.file_load_error", path=self.storage.db_path, error=str(e))
+                value = DATASET_DEFAULTS[data_type]()
+        elif data_type == "plays":
+            value = self.load_plays()
+        else:
+            value = self.load_file(self.files[data_type], {})
+        
+        if data_type == "plays":
+            for play in value:
+                ensure_play_result_fields(play)
+            self.rebuild_play_index(value)
+        return value
+    
+    def count(self, data_type: str) -> int:
+        """件数のみ取得（未読み込みならファイルのヘッダー・DBから求め、全件は解析しない）"""
+        if self.data.is_loaded(data_type):
+            return len(self.data[data_type] or [])
+        if self.storage:
+            try:
+                return self.storage.count(data_type)
+            except Exception:
+                return len(self.data[data_type] or [])
+        file_path = self.files[data_type]
+        if not os.path.exists(file_path):
+            count = 0
+        else:
+            count = read_header(file_path).get("count")
+            if count is None:
+                # 件数の記録が無い（旧形式の）ファイルは読み込んで数える
+                return len(self.data[data_type] or [])
+        if data_type == "plays":
+            count += self._count_journal_records()
+        return count
+    
+    def _count_journal_records(self) -> int:
+        """ジャーナルの行数（未統合のプレイ記録数）"""
+        try:
+            with open(self.plays_journal_file, 'rb') as f:
+                return sum(1 for line in f if line.strip())
+        except OSError:
+            return 0
+    
+    @property
+    def play_index(self) -> PlayIndex:
+        """プレイ記録インデックス（プレイ記録の読み込み時に構築）"""
+        self.data["plays"]
+        return self._play_index
+    
+    @property
+    def next_play_id(self) -> int:
+        self.data["plays"]
+        return self._next_play_id
+    
+    @next_play_id.setter
+    def next_play_id(self, value: int):
+        self._next_play_id = value
+    
+    def rebuild_play_index(self, plays: List[Dict] = None):
+        """プレイ記録インデックスを再構築"""
+        if plays is None:
+            plays = self.data.get("plays") or []
+        self._play_index = PlayIndex(plays)
+        play_ids = [p.get("id") for p in plays if isinstance(p.get("id"), int)]
+        self._next_play_id = max(play_ids, default=-1) + 1
+    
+    def get_plays_version(self) -> List:
+        """プレイ記録のバージョン（件数と次のプレイID）"""
+        return [len(self.data.get("plays") or []), self.next_play_id]
+    
+    def get_play_frames(self) -> PlayFrames:
+        """プレイ記録の列指向表現を取得（追加分の行だけを足し、過去の記録が変わったときだけ全件から再構築）"""
+        with self.lock:
+            plays = self.data.get("plays") or []
+            version = self.get_plays_version()
+            frames = self._play_frames
+            if frames is not None and self._play_frames_source is plays and frames.version == version:
+                return frames
+            
+            # 起動直後は前回保存した表から続ける
+            if frames is None:
+                frames = PlayFrames.load(self.play_frames_file)
+            if frames is not None and frames.is_prefix_of(plays):
+                added = plays[frames.total_plays:]
+                frames = frames.extend(added, version)
+            else:
+                added = plays
+                frames = PlayFrames.from_plays(plays, version)
+            if added:
+                frames.save(self.play_frames_file)
+            self._play_frames = frames
+            self._play_frames_source = plays
+            return frames
+    
+    def get_head_to_head(self) -> HeadToHead:
+        """プレイヤー同士の対戦成績（列指向データと同じバージョンごとに1回だけ集計）"""
+        with self.lock:
+            frames = self.get_play_frames()
+            if self._head_to_head is None or self._head_to_head_source is not frames:
+                self._head_to_head = HeadToHead.from_frames(frames, frames.version)
+                self._head_to_head_source = frames
+            return self._head_to_head
+    
+    def get_win_rate_intervals(self, method: str = "bayes") -> WinRateIntervals:
+        """勝率の信頼区間（列指向データと同じバージョン・方法ごとに1回だけ計算）"""
+        with self.lock:
+            frames = self.get_play_frames()
+            if self._win_rate_intervals_source is not frames:
+                self._win_rate_intervals = {}
+                self._win_rate_intervals_source = frames
+            if method in self._win_rate_intervals:
+                return self._win_rate_intervals[method]
+        # 計算（ブートストラップはプロセスプールを使う）は共有ロックの外で行い、
+        # 他セッションの書き込み・読み込みを止めない（列指向データは構築後に変更されない）
+        intervals = WinRateIntervals.from_frames(frames, method, version=frames.version)
+        with self.lock:
+            if self._win_rate_intervals_source is frames:
+                intervals = self._win_rate_intervals.setdefault(method, intervals)
+        return intervals
+    
+    def get_ratings(self) -> RatingEngine:
+        """現在のレーティングを取得（保存済みのものが古い場合のみ全件再計算）"""
+        with self.lock:
+            version = self.get_plays_version()
+            if self.ratings is None or self.ratings.version != version:
+                ratings = self._load_saved_ratings(version)
+                if ratings is None:
+                    ratings = self._replay_ratings(version)
+                self.ratings = ratings
+            return self.ratings
+    
+    def _load_saved_ratings(self, version) -> RatingEngine:
+        """保存済みのレーティングが最新なら読み込む（古ければNone、再計算はしない）"""
+        ratings = RatingEngine.load(self.ratings_file)
+        self._ratings_history = None
+        if ratings is None or ratings.version != version:
+            return None
+        return ratings
+    
+    def get_rating_history(self) -> List[List]:
+        """レーティングの推移（履歴ファイルから読み込み、再計算はしない）"""
+        with self.lock:
+            ratings = self.get_ratings()
+            if self._ratings_history is None:
+                history = ratings.read_history(self.ratings_history_file)
+                if history is None:
+                    # 履歴ファイルが壊れている・食い違う場合のみ再計算
+                    self.ratings = self._replay_ratings(ratings.version)
+                    history = self._ratings_history
+                self._ratings_history = history
+            return self._ratings_history
+    
+    def _replay_ratings(self, version) -> RatingEngine:
+        """全プレイからレーティングと履歴を再計算して保存"""
+        ratings, history = RatingEngine.replay(self.data.get("plays") or [], version)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            ratings.write_history(self.ratings_history_file, history)
+            ratings.save(self.ratings_file)
+        except Exception as e:
+            self._report("error", "errors.file_save_error", path=self.ratings_file, error=str(e))
+        self._ratings_history = history
+        return ratings
+    
+    def _update_ratings(self, play: Dict):
+        """追加したプレイをレーティングへ反映（過去の日付なら次回取得時に再計算）"""
+        ratings = self.ratings
+        if ratings is None or not ratings.can_apply(play):
+            self.ratings = None
+            self._ratings_history = None
+            return
+        rows = ratings.apply_play(play)
+        ratings.version = self.get_plays_version()
+        try:
+            ratings.append_history(self.ratings_history_file, rows)
+            ratings.save(self.ratings_file)
+        except Exception as e:
+            self.ratings = None
+            self._report("error", "errors.file_save_error", path=self.ratings_file, error=str(e))
+        if self._ratings_history is not None:
+            self._ratings_history.extend(rows)
+    
+    def load_plays(self) -> List[Dict]:
+        """プレイ記録読み込み（スナップショット + ジャーナル再生）"""
+        # 統合中のスナップショットとジャーナルを組み合わせて読まないよう共有ロック
+        with self.dataset_lock("plays", exclusive=False):
+            plays = self.load_file(self.files["plays"], [])
+            journal = self.load_plays_journal()
+        self.journal_count = len(journal)
+        
+        # 統合直後に中断された場合はスナップショットと重複するので除外
+        known_ids = {p.get("id") for p in plays}
+        for play in journal:
+            if play.get("id") not in known_ids:
+                plays.append(play)
+                known_ids.add(play.get("id"))
+        return plays
+    
+    def load_plays_journal(self) -> List[Dict]:
+        """プレイ記録ジャーナル読み込み"""
+        records = []
+        self.plays_journal_size = 0
+        self.file_signatures[self.plays_journal_file] = file_signature(self.plays_journal_file)
+        if not os.path.exists(self.plays_journal_file):
+            return records
+        try:
+            with open(self.plays_journal_file, 'rb') as f:
+                raw = f.read()
+            self.plays_journal_size = len(raw)
+            for line in raw.splitlines():
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    # 書き込み途中で中断された行は無視
+                    continue
+        except Exception as e:
+            self._report("error", "errors.file_load_error", path=self.plays_journal_file, error=str(e))
+        return records
+    
+    def append_plays_journal(self, play_data: Dict) -> bool:
+        """プレイ記録をジャーナルへ1行追記（fsync付き）"""
+        try:
+            line = (json.dumps(play_data, ensure_ascii=False, default=str) + "\n").encode('utf-8')
+            with open(self.plays_journal_file, 'a+b') as f:
+                # 中断で改行が欠けた末尾行に続けて書かない
+                f.seek(0, os.SEEK_END)
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        line = b"\n" + line
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+                self.plays_journal_size = f.tell()
+            self.file_signatures[self.plays_journal_file] = file_signature(self.plays_journal_file)
+            self.journal_count += 1
+            return True
+        except Exception as e:
+            self._report("error", "errors.file_save_error", path=self.plays_journal_file, error=str(e))
+        return False
+    
+    def compact_plays(self) -> bool:
+        """ジャーナルをスナップショットへ統合"""
+        if self.storage:
+            return True  # SQLiteは行単位で保存済み
+        with self.lock, self.dataset_lock("plays"):
+            if self.is_stale("plays"):
+                # 他プロセスが追加したプレイを取り込んでから統合（同じIDはメモリ側を優先）
+                known_ids = {p.get("id") for p in self.data["plays"]}
+                added = [p for p in self.load_plays() if p.get("id") not in known_ids]
+                if added:
+                    self.data["plays"] = sorted(self.data["plays"] + added, key=lambda p: p.get("id", 0))
+                    self.rebuild_play_index()
+            if not self.save_file(self.files["plays"], self.data["plays"]):
+                return False
+            try:
+                if os.path.exists(self.plays_journal_file):
+                    os.remove(self.plays_journal_file)
+                self.journal_count = 0
+                self.plays_journal_size = 0
+                self.file_signatures[self.plays_journal_file] = None
+                return True
+            except Exception as e:
+                self._report("error", "errors.file_save_error", path=self.plays_journal_file, error=str(e))
+            return False
     
     def save_games(self):
         """ゲームデータ保存"""
-        self.save_file(self.files["games"], self.data["games"])
+        if self.storage:
+            return self.save_to_storage("games")
+        return self.save_dataset_file("games")
     
     def save_players(self):
         """プレイヤーデータ保存"""
-        self.save_file(self.files["players"], self.data["players"])
+        if self.storage:
+            return self.save_to_storage("players")
+        return self.save_dataset_file("players")
     
     def save_plays(self):
-        """プレイ記録保存"""
-        self.save_file(self.files["plays"], self.data["plays"])
+        """プレイ記録保存（全件書き出しなのでジャーナルも統合される）"""
+        if self.storage:
+            return self.save_to_storage("plays")
+        return self.compact_plays()
     
     def save_score_sheets(self):
         """スコアシート保存"""
-        self.save_file(self.files["score_sheets"], self.data["score_sheets"])
-    
-    def save_data(self, data_type: str = None):
-        """データ保存（指定されたタイプのみ、または全て）"""
-        if data_type:
-            if data_type == "games":
-                self.save_games()
-            elif data_type == "players":
-                self.save_players()
-            elif data_type == "plays":
-                self.save_plays()
-            elif data_type == "score_sheets":
-                self.save_score_sheets()
-        else:
-            # 全て保存
-            self.save_games()
-            self.save_players()
-            self.save_plays()
-            self.save_score_sheets()
+        if self.storage:
+            return self.save_to_storage("score_sheets")
+        return self.save_dataset_file("score_sheets")
+    
+    def save_dataset_file(self, data_type: str) -> bool:
+        """辞書型データのファイル保存（他プロセスの変更があれば統合してから保存）"""
+        file_path = self.files[data_type]
+        with self.lock, self.dataset_lock(data_type):
+            if self.is_stale(data_type):
+                # 同じキーはメモリ側の内容を優先
+                merged = dict(self.load_file(file_path, {}) or {})
+                merged.update(self.data.get(data_type) or {})
+                self.data[data_type] = merged
+            return self.save_file(file_path, self.data[data_type])
+    
+    def save_to_storage(self, data_type: str) -> bool:
+        """SQLiteバックエンドへデータタイプ全体を保存"""
+        return self._storage_write(self.storage.replace_dataset, data_type, self.data[data_type])
+    
+    def _storage_write(self, operation, *args) -> bool:
+        """SQLiteバックエンドへの書き込み（エラー表示付き）"""
+        try:
+            operation(*args)
+            return True
+        except Exception as e:
+            self._report("error", "errors.file_save_error", path=self.storage.db_path, error=str(e))
+        return False
+    
+    def save_data(self, data_type: str = None) -> bool:
+        """データ保存（指定されたタイプのみ、または全て）- 全て保存できたかを返す"""
+        with self.lock:
+            if data_type:
+                if data_type == "games":
+                    return self.save_games()
+                elif data_type == "players":
+                    return self.save_players()
+                elif data_type == "plays":
+                    return self.save_plays()
+                elif data_type == "score_sheets":
+                    return self.save_score_sheets()
+                return False
+            else:
+                # 全て保存
+                results = [self.save_games(), self.save_players(), self.save_plays(), self.save_score_sheets()]
+                return all(results)
+    
+    def set_entry(self, data_type: str, key: str, value: Dict) -> bool:
+        """辞書型データの1件追加・更新（コピーオンライト）- 保存できたかを返す"""
+        with self.lock, self.dataset_lock(data_type):
+            # 他プロセスの変更を取り込んでから反映
+            self.refresh_if_stale(data_type)
+            # 他セッションが参照中の辞書は変更せず、新しい辞書に差し替える
+            entries = dict(self.data.get(data_type) or {})
+            entries[key] = value
+            if self.storage:
+                return self._replace_entries(data_type, entries, self.storage.upsert, data_type, key, value)
+            return self._replace_entries(data_type, entries)
+    
+    def set_entries(self, data_type: str, values: Dict) -> bool:
+        """辞書型データの複数件追加・更新（書き込みは1回）- 保存できたかを返す"""
+        if not values:
+            return True
+        with self.lock, self.dataset_lock(data_type):
+            self.refresh_if_stale(data_type)
+            entries = dict(self.data.get(data_type) or {})
+            entries.update(values)
+            if self.storage:
+                return self._replace_entries(data_type, entries, self.storage.upsert_many, data_type, values)
+            return self._replace_entries(data_type, entries)
+    
+    def remove_entry(self, data_type: str, key: str) -> bool:
+        """辞書型データの1件削除（コピーオンライト）- 削除して保存できたかを返す"""
+        with self.lock, self.dataset_lock(data_type):
+            self.refresh_if_stale(data_type)
+            entries = dict(self.data.get(data_type) or {})
+            if key not in entries:
+                return False
+            del entries[key]
+            if self.storage:
+                return self._replace_entries(data_type, entries, self.storage.delete, data_type, key)
+            return self._replace_entries(data_type, entries)
+    
+    def _replace_entries(self, data_type: str, entries: Dict, storage_operation=None, *args) -> bool:
+        """新しい辞書に差し替えて保存（保存できなければ元の辞書に戻し、メモリとファイルを食い違わせない）"""
+        previous = self.data.get(data_type)
+        self.data[data_type] = entries
+        saved = False
+        try:
+            if storage_operation:
+                saved = self._storage_write(storage_operation, *args)
+            else:
+                saved = self.save_data(data_type)
+        finally:
+            if not saved:
+                self.data[data_type] = previous
+        return saved
     
     def add_game(self, game_data: Dict):
         """ゲーム追加"""
@@ -100,87 +657,206 @@ class DataManager:
             st.error(st.session_state.lang_manager.get_text("errors.valid_game_name_not_found"))
             return False
         
-        # gamesが存在しない場合は初期化
-        if "games" not in self.data or self.data["games"] is None:
-            self.data["games"] = {}
-        
-        # 既に登録済みかチェック
-        if game_data["id"] in self.data["games"]:
-            st.warning(st.session_state.lang_manager.get_text("errors.game_already_registered", name=game_data['name']))
+        with self.lock, self.dataset_lock("games"):
+            self.refresh_if_stale("games")
+            # 既に登録済みかチェック
+            if game_data["id"] in (self.data.get("games") or {}):
+                st.warning(st.session_state.lang_manager.get_text("errors.game_already_registered", name=game_data['name']))
+                return False
+            
+            try:
+                if not self.set_entry("games", game_data["id"], game_data):  # ゲームデータのみ保存
+                    return False
+                st.success(st.session_state.lang_manager.get_text("player_management.added_success", name=game_data['name']))
+                return True
+            except Exception as e:
+                st.error(st.session_state.lang_manager.get_text("errors.game_add_error", error=str(e)))
+                return False
+    
+    def add_games(self, games: List[Dict]) -> List[str]:
+        """複数ゲームの一括追加（未登録のゲームのみ、保存は1回）- 追加したゲームIDを返す（保存できなければNone）"""
+        unknown_name = st.session_state.lang_manager.get_text("common.unknown_game")
+        with self.lock, self.dataset_lock("games"):
+            self.refresh_if_stale("games")
+            registered = self.data.get("games") or {}
+            new_games = {}
+            for game_data in games:
+                if not game_data or not game_data.get("id"):
+                    continue
+                if not game_data.get("name") or game_data.get("name") == unknown_name:
+                    continue
+                if game_data["id"] in registered or game_data["id"] in new_games:
+                    continue
+                new_games[game_data["id"]] = game_data
+            try:
+                if not self.set_entries("games", new_games):
+                    return None
+            except Exception as e:
+                st.error(st.session_state.lang_manager.get_text("errors.game_add_error", error=str(e)))
+                return None
+            return list(new_games)
+    
+    def update_game(self, game_id: str, updates: Dict) -> bool:
+        """ゲーム情報更新（IDは保持）- 更新して保存できたかを返す"""
+        with self.lock, self.dataset_lock("games"):
+            self.refresh_if_stale("games")
+            game = (self.data.get("games") or {}).get(game_id)
+            if game is None:
+                return False
+            updated_game = dict(game)
+            updated_game.update(updates)
+            return self.set_entry("games", game_id, updated_game)
+    
+    def update_games(self, updates: Dict[str, Dict]) -> int:
+        """複数ゲームの情報を一括更新（登録済みのゲームのみ）- 更新件数を返す"""
+        with self.lock, self.dataset_lock("games"):
+            self.refresh_if_stale("games")
+            games = self.data.get("games") or {}
+            updated_games = {}
+            for game_id, game_updates in updates.items():
+                if game_id not in games:
+                    continue
+                updated_game = dict(games[game_id])
+                updated_game.update(game_updates)
+                updated_games[game_id] = updated_game
+            if not self.set_entries("games", updated_games):
+                return 0
+            return len(updated_games)
+    
+    def delete_game(self, game_id: str):
+        """ゲーム削除"""
+        with self.lock:
+            # 他プロセスで追加されたプレイ記録も含めてチェックする
+            self.refresh_if_stale("plays")
+            self.refresh_if_stale("games")
+            if game_id in self.data.get("games", {}):
+                game_name = self.data["games"][game_id].get("name", st.session_state.lang_manager.get_text("common.unknown_game"))
+                
+                # 関連するプレイ記録もチェック
+                related_count = self.count_plays_for_game(game_id)
+                if related_count:
+                    st.warning(st.session_state.lang_manager.get_text("game_management.has_play_records", count=related_count))
+                    return False
+                
+                # スコアシートも削除
+                self.remove_entry("score_sheets", game_id)
+                
+                if not self.remove_entry("games", game_id):  # ゲームデータのみ保存
+                    return False
+                st.success(st.session_state.lang_manager.get_text("game_management.deleted", name=game_name))
+                return True
             return False
+    
+    def add_player(self, player_name: str, player_data: Dict = None) -> bool:
+        """プレイヤー追加 - 追加して保存できたかを返す"""
+        if not player_name or not player_name.strip():
+            return False
+            
+        player_name = player_name.strip()
         
-        try:
-            self.data["games"][game_data["id"]] = game_data
-            self.save_data("games")  # ゲームデータのみ保存
-            st.success(st.session_state.lang_manager.get_text("player_management.added_success", name=game_data['name']))
-            return True
-        except Exception as e:
-            st.error(st.session_state.lang_manager.get_text("errors.game_add_error", error=str(e)))
+        with self.lock, self.dataset_lock("players"):
+            self.refresh_if_stale("players")
+            if player_name not in (self.data.get("players") or {}):
+                if not player_data:
+                    player_data = {
+                        "name": player_name,
+                        "notes": "",
+                        "created_at": datetime.now().isoformat()
+                    }
+                return self.set_entry("players", player_name, player_data)  # プレイヤーデータのみ保存
             return False
     
-    def delete_game(self, game_id: str):
-        """ゲーム削除"""
-        if game_id in self.data.get("games", {}):
-            game_name = self.data["games"][game_id].get("name", st.session_state.lang_manager.get_text("common.unknown_game"))
+    def delete_player(self, player_name: str) -> bool:
+        """プレイヤー削除"""
+        return self.remove_entry("players", player_name)
+    
+    def set_score_sheet(self, game_id: str, sheet_data: Dict) -> bool:
+        """スコアシート保存 - 保存できたかを返す"""
+        return self.set_entry("score_sheets", game_id, sheet_data)
+    
+    def add_play(self, play_data: Dict) -> bool:
+        """プレイ記録追加"""
+        with self.lock, self.dataset_lock("plays"):
+            # 他プロセスの追加分を取り込んでからIDを採番
+            self.refresh_if_stale("plays")
             
-            # 関連するプレイ記録もチェック
-            plays = self.data.get("plays", [])
-            related_plays = [p for p in plays if p.get("game_id") == game_id]
-            if related_plays:
-                st.warning(st.session_state.lang_manager.get_text("game_management.has_play_records", count=len(related_plays)))
-                return False
+            # playsが存在しない場合は初期化
+            if "plays" not in self.data or self.data["plays"] is None:
+                self.data["plays"] = []
             
-            del self.data["games"][game_id]
+            # 追加前の状態のレーティングを用意しておく（全件再計算が必要な場合は
+            # ここでは行わず、統計画面で取得するときに任せる）
+            version = self.get_plays_version()
+            if self.ratings is None or self.ratings.version != version:
+                self.ratings = self._load_saved_ratings(version)
             
-            # スコアシートも削除
-            if game_id in self.data.get("score_sheets", {}):
-                del self.data["score_sheets"][game_id]
-                self.save_data("score_sheets")  # スコアシートファイル更新
+            play_data["id"] = self.next_play_id
+            play_data["created_at"] = datetime.now().isoformat()
+            # 勝者・協力ゲームかどうかは保存時に確定させる（集計のたびに求めない）
+            play_data.update(play_result_fields(play_data))
+            if self.storage:
+                # SQLiteでは書き込みトランザクション内でIDを確定（他プロセスと重複させない）
+                # 保存できなかった場合はメモリにも反映しない
+                if not self._storage_write(self.storage.insert_play, play_data):
+                    return False
+            self.next_play_id = play_data["id"] + 1
+            # リストへの追記は走査中の他セッションを壊さないのでその場で追加
+            self.data["plays"].append(play_data)
+            self.play_index.add(play_data)
+            self._update_ratings(play_data)
+            
+            if self.storage:
+                return True
+            
+            if not self.use_plays_journal:
+                self.save_data("plays")  # プレイ記録のみ保存
+                return True
             
-            self.save_data("games")  # ゲームデータのみ保存
-            st.success(st.session_state.lang_manager.get_text("game_management.deleted", name=game_name))
+            # 全件を書き直さずジャーナルへ追記し、一定件数ごとに統合
+            if not self.append_plays_journal(play_data):
+                self.save_data("plays")
+            elif self.journal_count >= PLAYS_JOURNAL_COMPACT_THRESHOLD:
+                self.compact_plays()
             return True
-        return False
     
-    def add_player(self, player_name: str, player_data: Dict = None):
-        """プレイヤー追加"""
-        if not player_name or not player_name.strip():
-            return False
-            
-        player_name = player_name.strip()
-        
-        # playersが存在しない場合は初期化
-        if "players" not in self.data or self.data["players"] is None:
-            self.data["players"] = {}
-        
-        if player_name not in self.data["players"]:
-            if player_data:
-                self.data["players"][player_name] = player_data
+    def delete_play(self, play_id: int) -> bool:
+        """プレイ記録削除"""
+        with self.lock, self.dataset_lock("plays"):
+            self.refresh_if_stale("plays")
+            play = self.play_index.get(play_id)
+            if play is None:
+                return False
+            # 走査中の他セッションに影響しないよう新しいリストに差し替える
+            self.data["plays"] = [p for p in self.data["plays"] if p.get("id") != play_id]
+            self.play_index.remove(play)
+            # 過去の記録が変わったのでレーティングは次回取得時に全件再計算
+            self.ratings = None
+            self._ratings_history = None
+            if self.storage:
+                self._storage_write(self.storage.delete_play, play_id)
             else:
-                self.data["players"][player_name] = {
-                    "name": player_name,
-                    "notes": "",
-                    "created_at": datetime.now().isoformat()
-                }
-            self.save_data("players")  # プレイヤーデータのみ保存
+                self.save_data("plays")  # 削除はジャーナルで表現できないので全件保存
             return True
-        return False
     
-    def add_play(self, play_data: Dict):
-        """プレイ記録追加"""
-        # playsが存在しない場合は初期化
-        if "plays" not in self.data or self.data["plays"] is None:
-            self.data["plays"] = []
-        
-        play_data["id"] = len(self.data["plays"])
-        play_data["created_at"] = datetime.now().isoformat()
-        self.data["plays"].append(play_data)
-        self.save_data("plays")  # プレイ記録のみ保存
+    def get_plays_for_game(self, game_id: str) -> List[Dict]:
+        """ゲームIDに対応するプレイ記録を取得"""
+        return self.play_index.plays_for_game(game_id)
+    
+    def count_plays_for_game(self, game_id: str) -> int:
+        """ゲームIDに対応するプレイ記録数を取得"""
+        return self.play_index.count_for_game(game_id)
+    
+    def get_plays_for_player(self, player_name: str) -> List[Dict]:
+        """プレイヤーが参加したプレイ記録を取得"""
+        return self.play_index.plays_for_player(player_name)
+    
+    def get_plays_on_date(self, play_date: str) -> List[Dict]:
+        """指定日のプレイ記録を取得"""
+        return self.play_index.plays_on_date(play_date)
     
     def get_game_stats(self, game_id: str) -> Dict:
         """ゲーム統計取得"""
-        plays = self.data.get("plays", [])
-        plays = [p for p in plays if p.get("game_id") == game_id]
+        plays = self.get_plays_for_game(game_id)
         if not plays:
             return {}
         
@@ -199,6 +875,9 @@ class DataManager:
         """データファイル情報取得"""
         info = {}
         for data_type, file_path in self.files.items():
+            if self.storage:
+                # SQLiteでは全データタイプが1つのDBファイルに入っている
+                file_path = self.storage.db_path
             if os.path.exists(file_path):
                 file_size = os.path.getsize(file_path)
                 modified_time = datetime.fromtimestamp(os.path.getmtime(file_path))
@@ -206,7 +885,7 @@ class DataManager:
                     "file_path": file_path,
                     "file_size": f"{file_size:,} bytes",
                     "modified_time": modified_time.strftime("%Y-%m-%d %H:%M:%S"),
-                    "record_count": len(self.data.get(data_type, []))
+                    "record_count": self.count(data_type)
                 }
             else:
                 info[data_type] = {
@@ -250,8 +929,13 @@ class DataManager:
     
     def update_game_multilingual_support(self):
         """既存ゲームデータを多言語対応形式に更新"""
-        games = self.data.get("games", {})
-        updated = False
+        with self.lock, self.dataset_lock("games"):
+            self.refresh_if_stale("games")
+            return self._update_game_multilingual_support()
+    
+    def _update_game_multilingual_support(self):
+        games = self.data.get("games") or {}
+        updated_games = {}
         
         for game_id, game in games.items():
             # 古い形式の場合、新しい形式に変換
@@ -262,16 +946,16 @@ class DataManager:
                 is_japanese = self._is_japanese_name(old_name)
                 is_english = self._is_english_name(old_name)
                 
-                # 新しい形式に変換
+                # 新しい形式に変換（他セッションが参照中の辞書は変更せず、新しい辞書を作る）
                 if is_japanese:
-                    game["names"] = {
+                    names = {
                         "primary": old_name,
                         "japanese": old_name,
                         "english": "",
                         "alternates": []
                     }
                 elif is_english:
-                    game["names"] = {
+                    names = {
                         "primary": old_name,
                         "japanese": "",
                         "english": old_name,
@@ -279,17 +963,17 @@ class DataManager:
                     }
                 else:
                     # その他の言語（中国語など）
-                    game["names"] = {
+                    names = {
                         "primary": old_name,
                         "japanese": "",
                         "english": "",
                         "alternates": [old_name]
                     }
                 
-                updated = True
+                updated_games[game_id] = dict(game, names=names)
         
-        if updated:
-            self.save_data("games")
+        if updated_games:
+            self.set_entries("games", updated_games)
             return True
         return False
     
@@ -323,4 +1007,18 @@ class DataManager:
             return False
         
         # ASCII文字のみで構成され、英字が含まれている
-        return text.isascii() and any(char.isalpha() for char in text)
\ No newline at end of file
+        return text.isascii() and any(char.isalpha() for char in text)
+
+# データディレクトリごとの共有インスタンス
+_shared_data_managers = {}
+_shared_data_managers_lock = threading.Lock()
+
+def get_shared_data_manager(data_dir: str = "data") -> DataManager:
+    """データディレクトリごとにプロセス内で1つのDataManagerを取得"""
+    key = os.path.abspath(data_dir)
+    with _shared_data_managers_lock:
+        data_manager = _shared_data_managers.get(key)
+        if data_manager is None:
+            data_manager = DataManager(data_dir)
+            _shared_data_managers[key] = data_manager
+        return data_manager
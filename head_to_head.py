@@ -0,0 +1,92 @@
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+
+class HeadToHead:
+    """プレイヤー同士の対戦成績（勝ち・負け・引き分け）- ゲーム別は疎な (ゲーム, プレイヤー, 相手) の組だけ保持
+
+    1回のプレイを参加者の全ペアの対戦とみなし、スコアの大小で勝敗を決める（協力ゲームは対象外）
+    """
+
+    def __init__(self, players: List[str], games: List, keys: np.ndarray, counts: np.ndarray, version=None):
+        self.players = players  # 行・列の順のプレイヤー名
+        self.games = games      # ゲームID（keys のゲーム番号の順）
+        self.keys = keys        # (ゲーム番号 * P + プレイヤー) * P + 相手 の昇順
+        self.counts = counts    # keys ごとの [勝ち, 負け, 引き分け]
+        self.version = version
+
+    @classmethod
+    def from_frames(cls, frames, version=None) -> "HeadToHead":
+        """縦持ちスコアから全ペアの対戦成績を一括集計（プレイごとのループなし）"""
+        plays = frames.plays
+        competitive = plays.loc[~plays["cooperative"], ["play_id", "game_id"]]
+        scores = frames.scores.merge(competitive, on="play_id", how="inner")
+        scores = scores[scores["score"].notna() & scores["game_id"].notna()].sort_values("play_id", kind="stable")
+
+        players = list(frames.scores["player"].cat.categories)
+        games = list(plays["game_id"].cat.categories)
+        if scores.empty:
+            return cls(players, games, np.empty(0, dtype=np.int64), np.empty((0, 3), dtype=np.int64), version)
+
+        player_codes = scores["player"].cat.codes.to_numpy(dtype=np.int64)
+        game_codes = scores["game_id"].cat.codes.to_numpy(dtype=np.int64)
+        values = scores["score"].to_numpy()
+
+        # 同じプレイの行同士を全て組み合わせる（プレイの人数 n に対して n*n 組）
+        _, starts, sizes = np.unique(scores["play_id"].to_numpy(), return_index=True, return_counts=True)
+        row_sizes = np.repeat(sizes, sizes)
+        row_starts = np.repeat(starts, sizes)
+        left = np.repeat(np.arange(len(scores)), row_sizes)
+        block_starts = np.repeat(np.cumsum(row_sizes) - row_sizes, row_sizes)
+        right = np.repeat(row_starts, row_sizes) + (np.arange(len(left)) - block_starts)
+        pairs = left != right
+        left, right = left[pairs], right[pairs]
+
+        outcome = np.sign(values[left] - values[right]).astype(np.int64)  # 1=勝ち, -1=負け, 0=引き分け
+        size = len(players)
+        pair_keys = (game_codes[left] * size + player_codes[left]) * size + player_codes[right]
+
+        # 同じ (ゲーム, プレイヤー, 相手) をまとめて数える
+        keys, inverse = np.unique(pair_keys, return_inverse=True)
+        counts = np.zeros((len(keys), 3), dtype=np.int64)
+        for column, result in enumerate((1, -1, 0)):
+            counts[:, column] = np.bincount(inverse[outcome == result], minlength=len(keys))
+        return cls(players, games, keys, counts, version)
+
+    def matrices(self, game_id=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """P×P の勝ち・負け・引き分け行列（行がプレイヤー、列が相手）。game_id=None なら全ゲーム合計"""
+        size = len(self.players)
+        keys, counts = self.keys, self.counts
+        if game_id is not None:
+            if game_id not in self.games:
+                keys, counts = keys[:0], counts[:0]
+            else:
+                # ゲーム番号の範囲だけを二分探索で切り出す
+                game = self.games.index(game_id)
+                lo, hi = np.searchsorted(keys, [game * size * size, (game + 1) * size * size])
+                keys, counts = keys[lo:hi], counts[lo:hi]
+        cells = keys % (size * size)
+        return tuple(
+            np.bincount(cells, weights=counts[:, column], minlength=size * size).astype(np.int64).reshape(size, size)
+            for column in range(3)
+        )
+
+    def records(self, game_id=None) -> pd.DataFrame:
+        """対戦のあったペアの成績（player, opponent, wins, losses, ties, games, win_rate）"""
+        wins, losses, ties = self.matrices(game_id)
+        games = wins + losses + ties
+        rows, cols = np.nonzero(games)
+        return pd.DataFrame({
+            "player": [self.players[i] for i in rows],
+            "opponent": [self.players[j] for j in cols],
+            "wins": wins[rows, cols],
+            "losses": losses[rows, cols],
+            "ties": ties[rows, cols],
+            "games": games[rows, cols],
+            "win_rate": (wins[rows, cols] + 0.5 * ties[rows, cols]) / games[rows, cols],
+        })
+
+    def game_ids(self) -> List:
+        """対戦成績のあるゲーム"""
+        size = len(self.players)
+        return [self.games[code] for code in np.unique(self.keys // (size * size))] if size else []
@@ -0,0 +1,194 @@
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from PIL import Image
+from bgg_http import get_session
+
+# ゲーム一覧で表示するサムネイルの幅（px）
+THUMBNAIL_WIDTH = 150
+# 画像キャッシュ全体の上限サイズ（超えたら最終参照の古いものから削除）
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+DEFAULT_IMAGE_DIR = os.path.join("data", ".cache", "images")
+# 裏で同時にダウンロードする画像の数
+PREFETCH_WORKERS = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    url TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (url, width)
+);
+CREATE INDEX IF NOT EXISTS idx_images_accessed_at ON images(accessed_at);
+"""
+
+def thumbnail_source(game: Dict) -> str:
+    """サムネイルの元画像URL（BGGのサムネイルがあればそれを使い、大きな画像の取得を避ける）"""
+    return game.get("thumbnail_url") or game.get("image_url") or ""
+
+def make_thumbnail(content: bytes, width: int = THUMBNAIL_WIDTH) -> bytes:
+    """指定幅（縦横比は維持）のJPEGサムネイルを作成"""
+    with Image.open(io.BytesIO(content)) as image:
+        # JPEGは縮小しながら読み込む（大きな箱絵のデコードを軽くする）
+        image.draft("RGB", (width, width * 4))
+        if image.width > width:
+            image.thumbnail((width, max(1, image.height * width // image.width)))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=85, optimize=True)
+        return output.getvalue()
+
+class ImageCache:
+    """箱絵のディスクキャッシュ - 元画像は1回だけ取得し、ファイル名は内容のハッシュ（同じ画像は1ファイル）"""
+
+    def __init__(self, directory: str = DEFAULT_IMAGE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._executor = None
+        self._pending = set()
+
+    def cached_path(self, url: str, width: int = THUMBNAIL_WIDTH) -> Optional[str]:
+        """保存済みの画像ファイルのパス（無ければNone）。width=0 は元画像"""
+        with self._lock:
+            row = self._conn.execute("SELECT name FROM images WHERE url = ? AND width = ?", (url, width)).fetchone()
+            if row is None:
+                return None
+            path = self._path(row[0])
+            if not os.path.exists(path):
+                with self._conn:
+                    self._conn.execute("DELETE FROM images WHERE url = ? AND width = ?", (url, width))
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE images SET accessed_at = ? WHERE url = ? AND width = ?", (time.time(), url, width))
+        return path
+
+    def fetch(self, url: str, width: int = THUMBNAIL_WIDTH) -> Optional[str]:
+        """画像を取得してパスを返す（元画像のダウンロード・サムネイル作成は初回のみ）- 失敗時はNone"""
+        path = self.cached_path(url, width)
+        if path or not url:
+            return path
+        original_path = self.cached_path(url, 0)
+        if original_path:
+            with open(original_path, 'rb') as f:
+                content = f.read()
+        else:
+            response = get_session().get(url, timeout=15)
+            if response.status_code != 200 or not response.content:
+                return None
+            content = response.content
+            original_path = self._store(url, 0, content, os.path.splitext(url.split("?")[0])[1].lower() or ".img")
+        if not width:
+            return original_path
+        return self._store(url, width, make_thumbnail(content, width), ".jpg")
+
+    def prefetch(self, url: str, width: int = THUMBNAIL_WIDTH):
+        """画像の取得を裏で開始（画面の表示は待たせない）"""
+        key = (url, width)
+        with self._lock:
+            if not url or key in self._pending:
+                return
+            self._pending.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="image-fetch")
+        self._executor.submit(self._prefetch, url, width)
+
+    def _prefetch(self, url: str, width: int):
+        try:
+            self.fetch(url, width)
+        except Exception:
+            pass  # 取得できなければ次の表示で再試行
+        finally:
+            with self._lock:
+                self._pending.discard((url, width))
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name[:2], name)
+
+    def _store(self, url: str, width: int, content: bytes, extension: str) -> str:
+        """内容のハッシュ名でファイルを保存して索引に登録し、上限サイズを超えた分を削除"""
+        name = hashlib.sha256(content).hexdigest() + extension
+        path = self._path(name)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(content)
+            os.replace(temp_path, path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO images (url, width, name, size, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (url, width, name, len(content), time.time())
+            )
+            self._evict()
+        return path
+
+    def _evict(self):
+        """最終参照の古い順に削除（LRU）- 他のURLからも参照されているファイルは残す"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM images").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        expired = []
+        for url, width, name, size in self._conn.execute("SELECT url, width, name, size FROM images ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            expired.append((url, width, name))
+            total -= size
+        for url, width, name in expired:
+            self._conn.execute("DELETE FROM images WHERE url = ? AND width = ?", (url, width))
+            if self._conn.execute("SELECT 1 FROM images WHERE name = ?", (name,)).fetchone() is None:
+                try:
+                    os.remove(self._path(name))
+                except OSError:
+                    pass
+
+    def clear(self):
+        """キャッシュを全て削除"""
+        with self._lock, self._conn:
+            for (name,) in self._conn.execute("SELECT DISTINCT name FROM images").fetchall():
+                try:
+                    os.remove(self._path(name))
+                except OSError:
+                    pass
+            self._conn.execute("DELETE FROM images")
+
+    def stats(self) -> Dict:
+        """件数と合計サイズ"""
+        with self._lock:
+            count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM images").fetchone()
+        return {"entries": count, "bytes": size}
+
+    def close(self):
+        """接続を閉じる"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._conn.close()
+
+# ディレクトリごとの共有インスタンス
+_shared_caches = {}
+_shared_caches_lock = threading.Lock()
+
+def get_image_cache(directory: str = DEFAULT_IMAGE_DIR) -> ImageCache:
+    """ディレクトリごとにプロセス内で1つのImageCacheを取得"""
+    key = os.path.abspath(directory)
+    with _shared_caches_lock:
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = ImageCache(directory)
+            _shared_caches[key] = cache
+        return cache
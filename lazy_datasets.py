@@ -0,0 +1,55 @@
+import threading
+from collections.abc import MutableMapping
+from typing import Callable, Iterable
+
+class LazyDatasets(MutableMapping):
+    """データタイプごとに初回アクセス時に読み込む辞書（DataManager.data）"""
+
+    def __init__(self, loader: Callable, data_types: Iterable[str], lock=None):
+        self._loader = loader
+        self._data_types = list(data_types)
+        self._loaded = {}
+        # 複数セッションから同時にアクセスされても1回だけ読み込む
+        self._lock = lock or threading.RLock()
+
+    def __getitem__(self, data_type):
+        try:
+            return self._loaded[data_type]
+        except KeyError:
+            pass
+        if data_type not in self._data_types:
+            raise KeyError(data_type)
+        with self._lock:
+            if data_type not in self._loaded:
+                self._loaded[data_type] = self._loader(data_type)
+            return self._loaded[data_type]
+
+    def __setitem__(self, data_type, value):
+        if data_type not in self._data_types:
+            self._data_types.append(data_type)
+        self._loaded[data_type] = value
+
+    def __delitem__(self, data_type):
+        self._data_types.remove(data_type)
+        self._loaded.pop(data_type, None)
+
+    def __contains__(self, data_type):
+        # 存在確認だけで読み込まない
+        return data_type in self._data_types
+
+    def __iter__(self):
+        return iter(list(self._data_types))
+
+    def __len__(self):
+        return len(self._data_types)
+
+    def is_loaded(self, data_type: str) -> bool:
+        """読み込み済みか"""
+        return data_type in self._loaded
+
+    def unload(self, data_type: str = None):
+        """読み込み済みのデータを破棄（次回アクセス時に読み直す）"""
+        if data_type is None:
+            self._loaded.clear()
+        else:
+            self._loaded.pop(data_type, None)
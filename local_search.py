@@ -0,0 +1,304 @@
+import bisect
+import hashlib
+import itertools
+import json
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List
+from bgg_cache import DEFAULT_BASE_URL
+
+DEFAULT_INDEX_PATH = os.path.join("data", ".cache", "game_catalog.sqlite3")
+# 部分一致とみなすn-gramの重なり（Dice係数）の下限
+MIN_FUZZY_SCORE = 0.45
+DEFAULT_LIMIT = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    year TEXT NOT NULL,
+    names TEXT NOT NULL
+);
+"""
+
+def search_index_path_for(base_url: str) -> str:
+    """接続先ごとの索引ファイル（代替サーバーのゲーム名を本番の索引に混ぜない）"""
+    if base_url.rstrip("/") == DEFAULT_BASE_URL:
+        return DEFAULT_INDEX_PATH
+    digest = hashlib.sha256(base_url.encode('utf-8')).hexdigest()[:8]
+    return os.path.join(os.path.dirname(DEFAULT_INDEX_PATH), f"game_catalog-{digest}.sqlite3")
+
+# ひらがな → ローマ字（ヘボン式）。拗音は2文字で先に照合する
+_KANA_DIGRAPHS = {
+    "きゃ": "kya", "きゅ": "kyu", "きょ": "kyo", "しゃ": "sha", "しゅ": "shu", "しょ": "sho",
+    "ちゃ": "cha", "ちゅ": "chu", "ちょ": "cho", "にゃ": "nya", "にゅ": "nyu", "にょ": "nyo",
+    "ひゃ": "hya", "ひゅ": "hyu", "ひょ": "hyo", "みゃ": "mya", "みゅ": "myu", "みょ": "myo",
+    "りゃ": "rya", "りゅ": "ryu", "りょ": "ryo", "ぎゃ": "gya", "ぎゅ": "gyu", "ぎょ": "gyo",
+    "じゃ": "ja", "じゅ": "ju", "じょ": "jo", "びゃ": "bya", "びゅ": "byu", "びょ": "byo",
+    "ぴゃ": "pya", "ぴゅ": "pyu", "ぴょ": "pyo", "ふぁ": "fa", "ふぃ": "fi", "ふぇ": "fe", "ふぉ": "fo",
+    "てぃ": "ti", "でぃ": "di", "でゅ": "dyu", "うぃ": "wi", "うぇ": "we", "うぉ": "wo",
+    "ゔぁ": "va", "ゔぃ": "vi", "ゔぇ": "ve", "ゔぉ": "vo", "しぇ": "she", "じぇ": "je", "ちぇ": "che",
+}
+_KANA = dict(zip(
+    "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん"
+    "がぎぐげござじずぜぞだぢづでどばびぶべぼぱぴぷぺぽゔぁぃぅぇぉゃゅょゎ",
+    "a i u e o ka ki ku ke ko sa shi su se so ta chi tsu te to na ni nu ne no ha hi fu he ho "
+    "ma mi mu me mo ya yu yo ra ri ru re ro wa o n ga gi gu ge go za ji zu ze zo da ji zu de do "
+    "ba bi bu be bo pa pi pu pe po vu a i u e o ya yu yo wa".split()
+))
+# 表記ゆれを吸収するローマ字の正規化（訓令式・長音・撥音の違いを同じ形にそろえる）
+_ROMAJI_RULES = [
+    ("tsu", "tu"), ("shi", "si"), ("chi", "ti"), ("sh", "sy"), ("ch", "ty"), ("ji", "zi"), ("j", "zy"),
+    ("fu", "hu"), ("ou", "o"), ("oh", "o"), ("oo", "o"), ("uu", "u"), ("aa", "a"), ("ii", "i"), ("ee", "e"),
+    ("nn", "n"), ("m(?=[bmp])", "n"), ("c(?=[aou])", "k"), ("ck", "k"), ("ph", "f"), ("l", "r"),
+]
+_ROMAJI_PATTERNS = [(re.compile(pattern), replacement) for pattern, replacement in _ROMAJI_RULES]
+_NON_WORD = re.compile(r"[\W_]+")
+
+def to_hiragana(text: str) -> str:
+    """カタカナをひらがなに変換"""
+    return "".join(chr(ord(ch) - 0x60) if "ァ" <= ch <= "ヶ" else ch for ch in text)
+
+def _strip_accents(text: str) -> str:
+    """ラテン文字の発音記号を除去（ō → o）。かなの濁点は残す"""
+    return "".join(
+        unicodedata.normalize("NFD", ch)[0] if "\u00c0" <= ch <= "\u024f" else ch
+        for ch in text
+    )
+
+def normalize(text: str) -> str:
+    """照合用の正規化（全角半角・大文字小文字・発音記号・カタカナ/ひらがなの違い、記号と空白を除去）"""
+    text = to_hiragana(_strip_accents(unicodedata.normalize("NFKC", text or "").casefold()))
+    return _NON_WORD.sub("", text.replace("ー", ""))
+
+def romanize(text: str) -> str:
+    """ひらがなをローマ字に変換（漢字などはそのまま）"""
+    result = []
+    i = 0
+    double_next = False
+    while i < len(text):
+        romaji = _KANA_DIGRAPHS.get(text[i:i + 2])
+        step = 2
+        if romaji is None:
+            romaji = _KANA.get(text[i])
+            step = 1
+        if text[i] == "っ":
+            double_next = True
+            i += 1
+            continue
+        if romaji is None:
+            romaji = text[i]
+        if double_next and romaji[0] not in "aiueon":
+            romaji = romaji[0] + romaji
+        double_next = False
+        result.append(romaji)
+        i += step
+    return "".join(result)
+
+def normalize_romaji(text: str) -> str:
+    """ローマ字・英字の表記ゆれをそろえる"""
+    for pattern, replacement in _ROMAJI_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+def search_keys(name: str) -> List[str]:
+    """名前を照合キーに変換（かな表記・ローマ字表記の両方）"""
+    key = normalize(name)
+    if not key:
+        return []
+    keys = [key]
+    if re.search(r"[ぁ-ゖ]", key):
+        keys.append(romanize(key))
+    if re.search(r"[a-z]", keys[-1]):
+        keys.append(normalize_romaji(keys[-1]))
+    return list(dict.fromkeys(keys))
+
+def ngrams(key: str, n: int = 2) -> List[str]:
+    """n-gram（先頭には目印を付けて前方一致を重視）"""
+    padded = f"^{key}"
+    return [padded[i:i + n] for i in range(max(1, len(padded) - n + 1))]
+
+def _flatten_names(names) -> List[str]:
+    """names（辞書または文字列のリスト）を名前のリストに変換"""
+    if isinstance(names, dict):
+        flat = [names.get("primary", ""), names.get("english", ""), names.get("japanese", "")]
+        flat.extend(names.get("alternates") or [])
+    else:
+        flat = list(names or [])
+    return [name for name in dict.fromkeys(flat) if name]
+
+class LocalSearchIndex:
+    """取得・登録したことのあるゲーム名のローカル索引 - n-gram転置索引と前方一致で、BGGに問い合わせずに検索"""
+
+    def __init__(self, db_path: str = DEFAULT_INDEX_PATH):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._data_version = None
+        self._registered = None
+        self._reset()
+
+    def _reset(self):
+        self.games = {}           # ゲームID → {"name", "year", "names"}
+        self._entries = []        # (照合キー, ゲームID, 表示名)
+        self._game_keys = {}      # ゲームID → 索引済みの照合キー
+        self._postings = {}       # n-gram → 照合キーの番号
+        self._sorted_keys = []    # 前方一致用に並べた (照合キー, 番号)
+
+    def _load(self):
+        """他のセッション・プロセスが追加していれば索引を作り直す"""
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+        self._reset()
+        self._registered = None
+        for game_id, name, year, names in self._conn.execute("SELECT id, name, year, names FROM games"):
+            self._index(game_id, name, year, json.loads(names))
+        self._data_version = data_version
+
+    def _index(self, game_id: str, name: str, year: str, names: List[str]) -> bool:
+        """メモリ上の索引に追加（名前は追加のみ）- 変わったかどうかを返す"""
+        game = self.games.get(game_id)
+        if game is None:
+            game = self.games[game_id] = {"name": name or (names[0] if names else ""), "year": year or "", "names": []}
+        changed = False
+        if name and game["name"] != name and name in names:
+            game["name"] = name
+            changed = True
+        if year and not game["year"]:
+            game["year"] = year
+            changed = True
+        keys = self._game_keys.setdefault(game_id, set())
+        for display_name in names:
+            if display_name in game["names"]:
+                continue
+            game["names"].append(display_name)
+            changed = True
+            for key in search_keys(display_name):
+                if key in keys:
+                    continue
+                keys.add(key)
+                entry = len(self._entries)
+                self._entries.append((key, game_id, display_name))
+                for gram in set(ngrams(key)):
+                    self._postings.setdefault(gram, []).append(entry)
+                bisect.insort(self._sorted_keys, (key, entry))
+        return changed
+
+    def add_games(self, games: Iterable[Dict]) -> int:
+        """ゲームを索引に追加 - 新しい情報があった件数を返す
+
+        names が辞書（ゲームデータ）ならその primary を、リスト（検索結果の名前など）なら name を代表名とする
+        """
+        with self._lock:
+            self._load()
+            rows = []
+            for game in games:
+                game_id = str(game.get("id", ""))
+                names = _flatten_names(game.get("names")) or _flatten_names([game.get("name", "")])
+                if not game_id or not names:
+                    continue
+                primary = game["names"].get("primary", "") if isinstance(game.get("names"), dict) else game.get("name", "")
+                if self._index(game_id, primary, str(game.get("year", "") or ""), names):
+                    indexed = self.games[game_id]
+                    rows.append((game_id, indexed["name"], indexed["year"], json.dumps(indexed["names"], ensure_ascii=False)))
+            if rows:
+                with self._conn:
+                    self._conn.executemany("INSERT OR REPLACE INTO games (id, name, year, names) VALUES (?, ?, ?, ?)", rows)
+                self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            return len(rows)
+
+    def sync_registered(self, games: Dict[str, Dict]):
+        """登録済みゲームを索引に反映（登録データが変わったときだけ）"""
+        with self._lock:
+            self._load()
+            if games is self._registered:
+                return
+            self.add_games(dict(game, id=game_id) for game_id, game in games.items())
+            self._registered = games
+
+    def search(self, query: str, registered: Dict[str, Dict] = None, limit: int = DEFAULT_LIMIT) -> List[Dict]:
+        """前方一致・部分一致・n-gramのあいまい一致で検索 - BGGの検索結果と同じ形（id, name, year）で返す"""
+        with self._lock:
+            if registered is not None:
+                self.sync_registered(registered)
+            else:
+                self._load()
+            scores = {}
+            for query_key in search_keys(query):
+                for entry, score in self._match(query_key):
+                    key, game_id, display_name = self._entries[entry]
+                    if score > scores.get(game_id, (0, ""))[0]:
+                        scores[game_id] = (score, display_name)
+
+            ranked = sorted(scores.items(), key=lambda item: (-item[1][0], self.games[item[0]]["name"]))[:limit]
+            results = []
+            for game_id, (score, display_name) in ranked:
+                game = self.games[game_id]
+                name = game["name"] if display_name == game["name"] else f"{display_name} / {game['name']}"
+                results.append({"id": game_id, "name": name, "year": game["year"], "score": round(score, 3)})
+            return results
+
+    def _match(self, query_key: str):
+        """照合キーごとの (番号, スコア) - 完全一致 > 前方一致 > 部分一致 > n-gram の重なり"""
+        matched = {}
+        # 前方一致（並べたキーを二分探索）
+        start = bisect.bisect_left(self._sorted_keys, (query_key, -1))
+        for key, entry in self._sorted_keys[start:]:
+            if not key.startswith(query_key):
+                break
+            matched[entry] = 1.0 if key == query_key else 0.9
+
+        # n-gram の重なり（Dice係数）で部分一致・表記ゆれを拾う
+        query_grams = set(ngrams(query_key))
+        counts = Counter(itertools.chain.from_iterable(self._postings.get(gram, ()) for gram in query_grams))
+        total = len(query_key)
+        # 最短のキーでも下限に届かない重なりは計算しない
+        min_common = MIN_FUZZY_SCORE * (total + 1) / 2
+        for entry, common in counts.items():
+            if common < min_common or entry in matched:
+                continue
+            key = self._entries[entry][0]
+            if query_key in key:
+                matched[entry] = 0.8
+                continue
+            score = 2 * common / (total + len(key))
+            if score >= MIN_FUZZY_SCORE:
+                matched[entry] = 0.7 * score
+        return matched.items()
+
+    def stats(self) -> Dict:
+        """ゲーム数と照合キー数"""
+        with self._lock:
+            self._load()
+            return {"games": len(self.games), "keys": len(self._entries)}
+
+    def close(self):
+        """接続を閉じる"""
+        with self._lock:
+            self._conn.close()
+
+# 索引ファイルごとの共有インスタンス
+_shared_indexes = {}
+_shared_indexes_lock = threading.Lock()
+
+def get_search_index(db_path: str = DEFAULT_INDEX_PATH) -> LocalSearchIndex:
+    """索引ファイルごとにプロセス内で1つのLocalSearchIndexを取得"""
+    key = os.path.abspath(db_path)
+    with _shared_indexes_lock:
+        index = _shared_indexes.get(key)
+        if index is None:
+            index = LocalSearchIndex(db_path)
+            _shared_indexes[key] = index
+        return index
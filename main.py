@@ -3,7 +3,8 @@ import traceback
 
 # 分割されたモジュールをインポート
 from language_manager import LanguageManager
-from data_manager import DataManager
+from data_manager import get_shared_data_manager
+from bgg_refresher import start_ranking_refresher
 from ui_common import render_sidebar, render_home_page
 from ui_game_management import render_game_management_page
 from ui_player_management import render_player_management_page
@@ -25,7 +26,10 @@ def init_session_state():
     if "lang_manager" not in st.session_state:
         st.session_state.lang_manager = LanguageManager()
     if "data_manager" not in st.session_state:
-        st.session_state.data_manager = DataManager()
+        # 全セッションで同じデータ（プロセス内共有）を使用
+        st.session_state.data_manager = get_shared_data_manager()
+        # BGGの評価・ランキングを裏で定期的に取り直す（画面の操作は待たせない）
+        start_ranking_refresher(st.session_state.data_manager)
     if "current_page" not in st.session_state:
         st.session_state.current_page = st.session_state.lang_manager.get_text("pages.home")
 
@@ -35,6 +39,9 @@ def main():
         # セッション状態を初期化
         init_session_state()
         
+        # 他セッション・他プロセスで変更されたデータのみ再読み込み
+        st.session_state.data_manager.refresh()
+        
         # サイドバーを表示
         render_sidebar()
 
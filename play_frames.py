@@ -0,0 +1,163 @@
+import os
+import pickle
+import tempfile
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from utils import get_play_winners, is_cooperative_play
+
+# 日付が無い・読めないプレイの扱い（月別集計の従来の扱いに合わせる）
+DEFAULT_DATE = "2024-01-01"
+
+class PlayFrames:
+    """プレイ記録の列指向表現 - データのバージョンごとに1回だけ構築して統計画面で共有
+
+    plays:  play_id, game_id(カテゴリ), date(datetime64), duration, game_type(カテゴリ), cooperative, player_count
+    scores: play_id, player(カテゴリ), score, is_winner（1プレイヤー1行の縦持ち）
+    """
+
+    def __init__(self, plays: pd.DataFrame, scores: pd.DataFrame, version=None):
+        self.plays = plays
+        self.scores = scores
+        self.version = version
+
+    @classmethod
+    def from_plays(cls, plays: List[Dict], version=None, start: int = 0) -> "PlayFrames":
+        """プレイ記録から構築（Pythonでの走査はここだけ。start は先頭のプレイの位置）"""
+        play_ids, game_ids, dates, durations, game_types, cooperative, player_counts = [], [], [], [], [], [], []
+        score_play_ids, score_players, score_values, score_winners = [], [], [], []
+        for position, play in enumerate(plays, start=start):
+            play_id = play.get("id")
+            play_id = play_id if isinstance(play_id, int) else -1 - position
+            scores = play.get("scores") or {}
+            winners = get_play_winners(play)
+
+            play_ids.append(play_id)
+            game_ids.append(play.get("game_id"))
+            # 日付部分（YYYY-MM-DD）だけを使う（日時の形式でも同じ日に集計）
+            dates.append(str(play.get("date") or DEFAULT_DATE)[:10])
+            durations.append(play.get("duration") or 0)
+            game_types.append(play.get("game_type") or "")
+            cooperative.append(is_cooperative_play(play))
+            player_counts.append(len(scores))
+
+            for player, score in scores.items():
+                score_play_ids.append(play_id)
+                score_players.append(player)
+                score_values.append(score)
+                score_winners.append(player in winners)
+
+        play_dates = pd.to_datetime(pd.Series(dates, dtype=object), errors="coerce", format="%Y-%m-%d")
+        plays_frame = pd.DataFrame({
+            "play_id": np.array(play_ids, dtype=np.int64),
+            "game_id": pd.Categorical(game_ids),
+            "date": play_dates.fillna(pd.Timestamp(DEFAULT_DATE)).to_numpy(dtype="datetime64[ns]"),
+            "duration": pd.to_numeric(pd.Series(durations, dtype=object), errors="coerce").fillna(0).to_numpy(dtype=np.int32),
+            "game_type": pd.Categorical(game_types),
+            "cooperative": np.array(cooperative, dtype=bool),
+            "player_count": np.array(player_counts, dtype=np.int16),
+        })
+        scores_frame = pd.DataFrame({
+            "play_id": np.array(score_play_ids, dtype=np.int64),
+            "player": pd.Categorical(score_players),
+            "score": pd.to_numeric(pd.Series(score_values, dtype=object), errors="coerce").to_numpy(dtype=np.float64),
+            "is_winner": np.array(score_winners, dtype=bool),
+        })
+        return cls(plays_frame, scores_frame, version)
+
+    def extend(self, plays: List[Dict], version=None) -> "PlayFrames":
+        """追加されたプレイの行だけを変換して足した新しい表（既存の行は走査しない）"""
+        if not plays:
+            return PlayFrames(self.plays, self.scores, version)
+        added = PlayFrames.from_plays(plays, start=len(self.plays))
+        return PlayFrames(_concat_frames(self.plays, added.plays), _concat_frames(self.scores, added.scores), version)
+
+    def is_prefix_of(self, plays: List[Dict]) -> bool:
+        """この表の行が plays の先頭部分と一致するか（IDは追加順に増えるので、最後の行のIDで判定）"""
+        count = len(self.plays)
+        if count == 0:
+            return True
+        if count > len(plays):
+            return False
+        last_id = plays[count - 1].get("id")
+        return isinstance(last_id, int) and last_id == int(self.plays["play_id"].iat[-1])
+
+    def save(self, path: str):
+        """表を保存（派生データなので失敗しても無視）"""
+        directory = os.path.dirname(path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump({"version": self.version, "plays": self.plays, "scores": self.scores}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    @classmethod
+    def load(cls, path: str) -> "PlayFrames":
+        """保存済みの表を読み込み（無い・読めなければNone）"""
+        try:
+            with open(path, 'rb') as f:
+                saved = pickle.load(f)
+            return cls(saved["plays"], saved["scores"], saved["version"])
+        except Exception:
+            return None
+
+    @property
+    def total_plays(self) -> int:
+        return len(self.plays)
+
+    @property
+    def total_duration(self) -> int:
+        return int(self.plays["duration"].sum())
+
+    @property
+    def avg_duration(self) -> float:
+        return float(self.plays["duration"].mean()) if len(self.plays) else 0
+
+    def monthly_counts(self) -> pd.Series:
+        """月（YYYY-MM）ごとのプレイ回数（時系列順）"""
+        months, counts = np.unique(self.plays["date"].to_numpy().astype("datetime64[M]"), return_counts=True)
+        return pd.Series(counts, index=months.astype(str))
+
+    def game_totals(self) -> pd.DataFrame:
+        """ゲームごとのプレイ回数・合計時間・平均時間（プレイの無いゲームは含まない）"""
+        totals = self.plays.groupby("game_id", observed=True)["duration"].agg(plays="size", duration="sum")
+        totals["avg_duration"] = totals["duration"] / totals["plays"]
+        return totals
+
+    def player_totals(self) -> pd.DataFrame:
+        """プレイヤーごとの参加数・勝利数・勝率（縦持ちスコアの1回のgroupby）"""
+        totals = self.scores.groupby("player", observed=True)["is_winner"].agg(plays="size", wins="sum")
+        totals["win_rate"] = totals["wins"] / totals["plays"]
+        return totals
+
+    def memory_usage(self) -> int:
+        """2つの表の使用メモリ（バイト）"""
+        return int(self.plays.memory_usage(deep=True).sum() + self.scores.memory_usage(deep=True).sum())
+
+def _concat_frames(first: pd.DataFrame, second: pd.DataFrame) -> pd.DataFrame:
+    """同じ列構成の表を縦に連結（カテゴリ列はカテゴリを統合し、一から構築した場合と同じ並びにする）"""
+    columns = {}
+    for column in first.columns:
+        if isinstance(first[column].dtype, pd.CategoricalDtype):
+            columns[column] = _concat_categoricals(first[column], second[column])
+        else:
+            columns[column] = np.concatenate([first[column].to_numpy(), second[column].to_numpy()])
+    return pd.DataFrame(columns)
+
+def _concat_categoricals(first: pd.Series, second: pd.Series) -> pd.Categorical:
+    """2つのカテゴリ列を連結（コードの付け替えのみで、値そのものは比較しない）"""
+    categories = first.cat.categories.union(second.cat.categories)
+    codes = []
+    for series in (first, second):
+        # 欠損（コード -1）は -1 のまま
+        mapping = np.append(categories.get_indexer(series.cat.categories), -1)
+        codes.append(mapping[series.cat.codes.to_numpy()])
+    return pd.Categorical.from_codes(np.concatenate(codes), categories=categories)
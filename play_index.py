@@ -0,0 +1,69 @@
+from typing import Dict, List
+
+class PlayIndex:
+    """プレイ記録の二次インデックス（ゲームID・プレイヤー・日付 → プレイID）"""
+
+    def __init__(self, plays: List[Dict] = None):
+        self.plays_by_id = {}
+        # 値は挿入順を保つ集合として辞書を使う（削除もO(1)）
+        self.by_game = {}
+        self.by_player = {}
+        self.by_date = {}
+        for play in plays or []:
+            self.add(play)
+
+    def add(self, play: Dict):
+        """プレイ記録をインデックスに追加"""
+        play_id = play.get("id")
+        self.plays_by_id[play_id] = play
+        self.by_game.setdefault(play.get("game_id"), {})[play_id] = None
+        self.by_date.setdefault(play.get("date"), {})[play_id] = None
+        for player in (play.get("scores") or {}):
+            self.by_player.setdefault(player, {})[play_id] = None
+
+    def remove(self, play: Dict):
+        """プレイ記録をインデックスから削除"""
+        play_id = play.get("id")
+        self.plays_by_id.pop(play_id, None)
+        self._discard(self.by_game, play.get("game_id"), play_id)
+        self._discard(self.by_date, play.get("date"), play_id)
+        for player in (play.get("scores") or {}):
+            self._discard(self.by_player, player, play_id)
+
+    def get(self, play_id) -> Dict:
+        """プレイIDからプレイ記録を取得"""
+        return self.plays_by_id.get(play_id)
+
+    def plays_for_game(self, game_id: str) -> List[Dict]:
+        """ゲームIDに対応するプレイ記録"""
+        return self._resolve(self.by_game.get(game_id))
+
+    def plays_for_player(self, player_name: str) -> List[Dict]:
+        """プレイヤーが参加したプレイ記録"""
+        return self._resolve(self.by_player.get(player_name))
+
+    def plays_on_date(self, play_date: str) -> List[Dict]:
+        """指定日のプレイ記録"""
+        return self._resolve(self.by_date.get(play_date))
+
+    def count_for_game(self, game_id: str) -> int:
+        """ゲームIDに対応するプレイ記録数"""
+        return len(self.by_game.get(game_id, ()))
+
+    def count_for_player(self, player_name: str) -> int:
+        """プレイヤーの参加プレイ数"""
+        return len(self.by_player.get(player_name, ()))
+
+    def _resolve(self, play_ids) -> List[Dict]:
+        if not play_ids:
+            return []
+        return [self.plays_by_id[play_id] for play_id in list(play_ids)]
+
+    @staticmethod
+    def _discard(index: Dict, key, play_id):
+        play_ids = index.get(key)
+        if play_ids is None:
+            return
+        play_ids.pop(play_id, None)
+        if not play_ids:
+            del index[key]
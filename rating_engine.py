@@ -0,0 +1,179 @@
+import json
+import os
+import tempfile
+from typing import Dict, List, Tuple
+from utils import is_cooperative_play
+
+# 多人数Elo（各プレイを全ペアの1対1に分解し、K を相手の数で割る）
+INITIAL_RATING = 1500.0
+K_FACTOR = 32.0
+# 日付が無いプレイの並び順（月別集計の従来の扱いに合わせる）
+DEFAULT_DATE = "2024-01-01"
+
+# 履歴の1行: プレイID, 日付, ゲームID, プレイヤー, 全体レーティング, ゲーム別レーティング
+HISTORY_FIELDS = ("play_id", "date", "game_id", "player", "rating", "game_rating")
+
+def play_order_key(play: Dict) -> Tuple[str, int]:
+    """レーティングを計算する順序（日付 → プレイID）"""
+    play_id = play.get("id")
+    return (str(play.get("date") or DEFAULT_DATE)[:10], play_id if isinstance(play_id, int) else -1)
+
+def expected_score(rating: float, opponent: float) -> float:
+    """1対1の期待勝率"""
+    return 1.0 / (1.0 + 10 ** ((opponent - rating) / 400.0))
+
+def elo_deltas(ratings: Dict[str, float], scores: Dict[str, float], k_factor: float = K_FACTOR) -> Dict[str, float]:
+    """1プレイ分のレーティング変化（スコアの大小で全ペアを勝ち・負け・引き分けとみなす）"""
+    players = list(scores)
+    opponents = len(players) - 1
+    deltas = {}
+    for player in players:
+        total = 0.0
+        for opponent in players:
+            if opponent == player:
+                continue
+            if scores[player] > scores[opponent]:
+                actual = 1.0
+            elif scores[player] < scores[opponent]:
+                actual = 0.0
+            else:
+                actual = 0.5
+            total += actual - expected_score(ratings[player], ratings[opponent])
+        deltas[player] = k_factor / opponents * total
+    return deltas
+
+class RatingEngine:
+    """プレイヤーの全体・ゲーム別レーティング - 新しいプレイは差分更新、過去の記録が変わったときだけ全件再計算
+
+    現在のレーティングは ratings.json、推移は ratings_history.jsonl（追記のみ）に保存する
+    """
+
+    def __init__(self):
+        self.ratings = {}       # プレイヤー -> 全体レーティング
+        self.game_ratings = {}  # ゲームID -> {プレイヤー -> レーティング}
+        self.rated_plays = {}   # プレイヤー -> レーティング対象のプレイ数
+        self.last_key = None    # 最後に反映したプレイの順序キー
+        self.history_size = 0   # 履歴ファイルの有効なバイト数（それ以降は中断された書き込み）
+        self.version = None
+
+    @classmethod
+    def replay(cls, plays: List[Dict], version=None) -> Tuple["RatingEngine", List[List]]:
+        """全プレイを日付順に再計算 - (エンジン, 履歴)"""
+        engine = cls()
+        history = []
+        for play in sorted(plays, key=play_order_key):
+            history.extend(engine.apply_play(play))
+        engine.version = version
+        return engine, history
+
+    def can_apply(self, play: Dict) -> bool:
+        """差分更新できるか（反映済みのどのプレイよりも後のプレイか）"""
+        return self.last_key is None or play_order_key(play) >= self.last_key
+
+    def apply_play(self, play: Dict) -> List[List]:
+        """1プレイ分をレーティングに反映 - 追加された履歴行を返す"""
+        key = play_order_key(play)
+        self.last_key = key if self.last_key is None else max(self.last_key, key)
+        scores = play.get("scores") or {}
+        # 協力ゲームは全員が同じ結果なので対戦の強さには使わない
+        if len(scores) < 2 or is_cooperative_play(play):
+            return []
+        try:
+            scores = {player: float(score) for player, score in scores.items()}
+        except (TypeError, ValueError):
+            return []
+
+        game_id = play.get("game_id")
+        game_ratings = self.game_ratings.setdefault(game_id, {})
+        current = {player: self.ratings.get(player, INITIAL_RATING) for player in scores}
+        current_game = {player: game_ratings.get(player, INITIAL_RATING) for player in scores}
+        deltas = elo_deltas(current, scores)
+        game_deltas = elo_deltas(current_game, scores)
+
+        rows = []
+        for player in scores:
+            self.ratings[player] = current[player] + deltas[player]
+            game_ratings[player] = current_game[player] + game_deltas[player]
+            self.rated_plays[player] = self.rated_plays.get(player, 0) + 1
+            rows.append([play.get("id"), key[0], game_id, player,
+                         round(self.ratings[player], 2), round(game_ratings[player], 2)])
+        return rows
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": self.version,
+            "last_key": list(self.last_key) if self.last_key else None,
+            "ratings": self.ratings,
+            "game_ratings": self.game_ratings,
+            "rated_plays": self.rated_plays,
+            "history_size": self.history_size
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RatingEngine":
+        engine = cls()
+        engine.version = data.get("version")
+        engine.last_key = tuple(data["last_key"]) if data.get("last_key") else None
+        engine.ratings = data.get("ratings", {})
+        engine.game_ratings = data.get("game_ratings", {})
+        engine.rated_plays = data.get("rated_plays", {})
+        engine.history_size = data.get("history_size", 0)
+        return engine
+
+    def save(self, file_path: str):
+        """現在のレーティングを保存（一時ファイル経由で置き換え）"""
+        _replace_file(file_path, json.dumps(self.to_dict(), ensure_ascii=False))
+
+    @classmethod
+    def load(cls, file_path: str) -> "RatingEngine":
+        """保存済みのレーティングを読み込み（無ければNone）"""
+        if not os.path.exists(file_path):
+            return None
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return cls.from_dict(json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def write_history(self, history_path: str, rows: List[List]):
+        """再計算した履歴で履歴ファイルを置き換え"""
+        data = _encode_rows(rows)
+        _replace_file(history_path, data)
+        self.history_size = len(data)
+
+    def append_history(self, history_path: str, rows: List[List]):
+        """差分更新した分の履歴を追記（中断された書き込みの残りは切り詰めてから）"""
+        if not rows:
+            return
+        data = _encode_rows(rows)
+        with open(history_path, 'ab') as f:
+            f.truncate(self.history_size)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.history_size += len(data)
+
+    def read_history(self, history_path: str) -> List[List]:
+        """履歴を読み込み - 記録と食い違えばNone（再計算が必要）"""
+        try:
+            with open(history_path, 'rb') as f:
+                data = f.read(self.history_size)
+            if len(data) != self.history_size:
+                return None
+            return [json.loads(line) for line in data.splitlines() if line.strip()]
+        except (OSError, ValueError):
+            return None
+
+def _encode_rows(rows: List[List]) -> bytes:
+    return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows).encode('utf-8')
+
+def _replace_file(file_path: str, data):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data if isinstance(data, bytes) else data.encode('utf-8'))
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
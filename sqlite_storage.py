@@ -0,0 +1,217 @@
+import sqlite3
+import json
+import os
+import sys
+import tempfile
+import threading
+import yaml
+from typing import Dict
+from yaml_store import SafeLoader
+
+# データタイプごとのテーブル名とキー列
+DATASET_TABLES = {
+    "games": ("games", "id"),
+    "players": ("players", "name"),
+    "score_sheets": ("score_sheets", "game_id"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id TEXT PRIMARY KEY,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT PRIMARY KEY,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS score_sheets (
+    game_id TEXT PRIMARY KEY,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS plays (
+    id INTEGER PRIMARY KEY,
+    game_id TEXT,
+    date TEXT,
+    duration INTEGER,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_plays_game_id ON plays(game_id);
+CREATE INDEX IF NOT EXISTS idx_plays_date ON plays(date);
+"""
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+class SQLiteStorage:
+    """SQLite（WALモード）保存バックエンド - 行単位の書き込み"""
+
+    DB_FILENAME = "tabletop.sqlite3"
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        """接続を閉じる"""
+        with self._lock:
+            self._conn.close()
+
+    def data_version(self) -> int:
+        """他の接続がコミットするたびに変わる値（変更検出用）"""
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def load_dataset(self, data_type: str):
+        """データタイプ1つ分の読み込み"""
+        with self._lock:
+            if data_type == "plays":
+                rows = self._conn.execute("SELECT doc FROM plays ORDER BY id")
+                return [json.loads(row[0]) for row in rows]
+            table, key = DATASET_TABLES[data_type]
+            rows = self._conn.execute(f"SELECT {key}, doc FROM {table} ORDER BY rowid")
+            return {row[0]: json.loads(row[1]) for row in rows}
+
+    def count(self, data_type: str) -> int:
+        """データタイプの件数"""
+        table = "plays" if data_type == "plays" else DATASET_TABLES[data_type][0]
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def replace_dataset(self, data_type: str, value):
+        """データタイプ全体を置き換え（1トランザクション）"""
+        with self._lock, self._conn:
+            if data_type == "plays":
+                self._conn.execute("DELETE FROM plays")
+                self._conn.executemany(
+                    "INSERT INTO plays (id, game_id, date, duration, doc) VALUES (?, ?, ?, ?, ?)",
+                    [self._play_row(play) for play in (value or [])]
+                )
+            else:
+                table, key = DATASET_TABLES[data_type]
+                self._conn.execute(f"DELETE FROM {table}")
+                self._conn.executemany(
+                    f"INSERT INTO {table} ({key}, doc) VALUES (?, ?)",
+                    [(k, _dumps(v)) for k, v in (value or {}).items()]
+                )
+
+    def upsert(self, data_type: str, key: str, value: Dict):
+        """1行の追加・更新"""
+        table, key_column = DATASET_TABLES[data_type]
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {table} ({key_column}, doc) VALUES (?, ?)",
+                (key, _dumps(value))
+            )
+
+    def upsert_many(self, data_type: str, entries: Dict):
+        """複数行の追加・更新（1トランザクション）"""
+        table, key_column = DATASET_TABLES[data_type]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {table} ({key_column}, doc) VALUES (?, ?)",
+                [(key, _dumps(value)) for key, value in entries.items()]
+            )
+
+    def delete(self, data_type: str, key: str):
+        """1行の削除"""
+        table, key_column = DATASET_TABLES[data_type]
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {table} WHERE {key_column} = ?", (key,))
+
+    def insert_play(self, play: Dict):
+        """プレイ記録1件の追加（他プロセスと重複しないIDを採番）"""
+        with self._lock, self._conn:
+            # 書き込みロックを先に取り、採番と挿入を同じトランザクションで行う
+            self._conn.execute("BEGIN IMMEDIATE")
+            next_id = self._conn.execute("SELECT COALESCE(MAX(id), -1) + 1 FROM plays").fetchone()[0]
+            play["id"] = max(play.get("id") or 0, next_id)
+            self._conn.execute(
+                "INSERT INTO plays (id, game_id, date, duration, doc) VALUES (?, ?, ?, ?, ?)",
+                self._play_row(play)
+            )
+
+    def delete_play(self, play_id: int):
+        """プレイ記録1件の削除"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM plays WHERE id = ?", (play_id,))
+
+    def backup(self, backup_path: str):
+        """オンラインバックアップ"""
+        with self._lock:
+            target = sqlite3.connect(backup_path)
+            try:
+                self._conn.backup(target)
+            finally:
+                target.close()
+
+    @staticmethod
+    def _play_row(play: Dict) -> tuple:
+        return (play.get("id"), play.get("game_id"), play.get("date"), play.get("duration"), _dumps(play))
+
+def migrate_yaml_to_sqlite(data_dir: str, db_path: str = None) -> Dict[str, int]:
+    """data/*.yaml（+ plays.journal）をSQLiteへ一括移行"""
+    if db_path is None:
+        db_path = os.path.join(data_dir, SQLiteStorage.DB_FILENAME)
+
+    def load_yaml(name, default):
+        path = os.path.join(data_dir, name)
+        if not os.path.exists(path):
+            return default
+        with open(path, 'r', encoding='utf-8') as f:
+            value = yaml.load(f, Loader=SafeLoader)
+        return value if value is not None else default
+
+    data = {
+        "games": load_yaml("games.yaml", {}),
+        "players": load_yaml("players.yaml", {}),
+        "plays": load_yaml("plays.yaml", []),
+        "score_sheets": load_yaml("score_sheets.yaml", {})
+    }
+
+    # 未統合のジャーナル分も取り込む
+    journal_path = os.path.join(data_dir, "plays.journal")
+    if os.path.exists(journal_path):
+        known_ids = {p.get("id") for p in data["plays"]}
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    play = json.loads(line)
+                except json.JSONDecodeError:
+                    # 中断された書き込みの行だけを読み飛ばす
+                    continue
+                if play.get("id") not in known_ids:
+                    data["plays"].append(play)
+                    known_ids.add(play.get("id"))
+
+    # 一時ファイルに作ってから置き換える（途中で落ちても不完全なDBを残さない）
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(db_path) or ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        storage = SQLiteStorage(temp_path)
+        try:
+            for data_type, value in data.items():
+                storage.replace_dataset(data_type, value)
+        finally:
+            storage.close()
+        os.replace(temp_path, db_path)
+    finally:
+        for path in (temp_path, temp_path + "-wal", temp_path + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    return {data_type: len(value) for data_type, value in data.items()}
+
+if __name__ == "__main__":
+    # 使い方: python sqlite_storage.py [data_dir]
+    source_dir = sys.argv[1] if len(sys.argv) > 1 else "data"
+    counts = migrate_yaml_to_sqlite(source_dir)
+    for data_type, count in counts.items():
+        print(f"{data_type}: {count}")
@@ -41,12 +41,12 @@ def render_sidebar():
     
     st.sidebar.markdown("---")
     
-    # 簡易統計表示
+    # 簡易統計表示（件数のみ取得し、プレイ記録全体は読み込まない）
     dm = st.session_state.data_manager
     st.sidebar.markdown(f"### {lang.get_text('sidebar.simple_stats')}")
-    st.sidebar.metric(lang.get_text("sidebar.registered_games"), len(dm.data.get("games", {})))
-    st.sidebar.metric(lang.get_text("sidebar.play_records"), len(dm.data.get("plays", [])))
-    st.sidebar.metric(lang.get_text("sidebar.players"), len(dm.data.get("players", {})))
+    st.sidebar.metric(lang.get_text("sidebar.registered_games"), dm.count("games"))
+    st.sidebar.metric(lang.get_text("sidebar.play_records"), dm.count("plays"))
+    st.sidebar.metric(lang.get_text("sidebar.players"), dm.count("players"))
 
 def render_home_page():
     """ホームページ表示"""
@@ -61,21 +61,21 @@ def render_home_page():
     with col1:
         st.metric(
             label=f"📚 {lang.get_text('sidebar.registered_games')}",
-            value=len(dm.data.get("games", {})),
+            value=dm.count("games"),
             delta=None
         )
     
     with col2:
         st.metric(
             label=f"🎮 {lang.get_text('sidebar.play_records')}",
-            value=len(dm.data.get("plays", [])),
+            value=dm.count("plays"),
             delta=None
         )
     
     with col3:
         st.metric(
             label=f"👥 {lang.get_text('sidebar.players')}",
-            value=len(dm.data.get("players", {})),
+            value=dm.count("players"),
             delta=None
         )
     
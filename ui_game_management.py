@@ -1,6 +1,9 @@
 import streamlit as st
 import time
 from bgg_api import BGGApi
+from bgg_fetcher import DetailFetchJob
+from collection_import import CollectionImportJob, parse_collection_ids, parse_id_list
+from image_cache import THUMBNAIL_WIDTH, get_image_cache, thumbnail_source
 
 def render_game_management_page():
     """ゲーム管理ページ"""
@@ -8,7 +11,11 @@ def render_game_management_page():
     st.title(lang.get_text("game_management.title"))
     dm = st.session_state.data_manager
 
-    tab1, tab2 = st.tabs([lang.get_text("game_management.search_tab"), lang.get_text("game_management.registered_tab")])
+    tab1, tab2, tab3 = st.tabs([
+        lang.get_text("game_management.search_tab"),
+        lang.get_text("game_management.registered_tab"),
+        lang.get_text("game_management.import_tab")
+    ])
 
     with tab1:
         _render_game_search_tab(lang, dm)
@@ -16,24 +23,42 @@ def render_game_management_page():
     with tab2:
         _render_registered_games_tab(lang, dm)
 
+    with tab3:
+        _render_collection_import_tab(lang, dm)
+
 def _render_game_search_tab(lang, dm):
     """ゲーム検索タブの表示"""
     st.markdown(f"### {lang.get_text('game_management.search_title')}")
     search_query = st.text_input(lang.get_text("game_management.game_name"), placeholder=lang.get_text("game_management.search_placeholder"))
 
-    if st.button(lang.get_text("game_management.search_button")) and search_query:
+    # 取得・登録したことのあるゲームはローカル索引から即座に検索
+    local_results = BGGApi.search_local(search_query, dm.data["games"]) if search_query else []
+
+    col_search, col_bgg = st.columns([1, 3])
+    with col_search:
+        search_clicked = st.button(lang.get_text("game_management.search_button"))
+    with col_bgg:
+        bgg_clicked = bool(local_results) and st.button(lang.get_text("game_management.search_bgg_button"))
+
+    # ローカルで見つからなかったとき（または明示的に指定されたとき）だけBGGに問い合わせる
+    if search_query and (bgg_clicked or (search_clicked and not local_results)):
         with st.spinner(lang.get_text("common.searching")):
             games = BGGApi.search_games(search_query)
         
         # セッション状態にゲームリストを保存
         st.session_state.search_results = games
+        st.session_state.search_results_query = search_query
     
-    # 検索結果の表示（セッション状態から）
-    if hasattr(st.session_state, 'search_results') and st.session_state.search_results:
-        _render_search_results(lang, dm, st.session_state.search_results)
+    # 検索結果の表示（BGGの検索結果があればそれを優先）
+    if search_query and st.session_state.get("search_results_query") == search_query:
+        if st.session_state.search_results:
+            _render_search_results(lang, dm, st.session_state.search_results)
+        else:
+            st.warning(lang.get_text("game_management.no_results"))
     
-    elif hasattr(st.session_state, 'search_results') and not st.session_state.search_results:
-        st.warning(lang.get_text("game_management.no_results"))
+    elif local_results:
+        st.caption(lang.get_text("game_management.local_results", count=len(local_results)))
+        _render_search_results(lang, dm, local_results)
 
 def _render_search_results(lang, dm, games):
     """検索結果の表示"""
@@ -102,15 +127,123 @@ def _render_search_results(lang, dm, games):
                             st.error(lang.get_text("game_management.add_failed"))
                     else:
                         st.error(lang.get_text("game_management.details_failed"))
+                
+                # まとめて追加する対象として選択
+                st.checkbox(lang.get_text("game_management.select_for_batch"), key=f"select_game_{game['id']}_{actual_index}")
         
         # 区切り線（最後の要素以外）
         if i < len(display_games) - 1:
             st.divider()
     
+    # 選択したゲームをまとめて追加（詳細は並行取得）
+    _render_add_selected_button(lang, dm, games)
+    
     # フッター情報
     if items_per_page != lang.get_text("game_management.all_items") and total_pages > 1:
         st.markdown(f"**{lang.get_text('game_management.displaying')}**: {start_idx + 1}-{end_idx} / **{lang.get_text('game_management.total_items')}**: {len(games)}")
 
+def _render_add_selected_button(lang, dm, games):
+    """選択したゲームの一括追加ボタン"""
+    registered = dm.data["games"]
+    selected = {
+        game['id']: game for index, game in enumerate(games)
+        if st.session_state.get(f"select_game_{game['id']}_{index}") and game['id'] not in registered
+    }
+    if not selected:
+        return
+    
+    if not st.button(lang.get_text("game_management.add_selected_button", count=len(selected)), key="add_selected_games"):
+        return
+    
+    # 取得中に押すと再実行で処理が止まり、残りの取得は取り消される
+    st.button(lang.get_text("game_management.cancel_button"), key="cancel_add_selected")
+    progress_bar = st.progress(0.0, text=lang.get_text("game_management.fetching_progress", done=0, total=len(selected), name=""))
+    
+    fetched = []
+    job = DetailFetchJob(list(selected))
+    try:
+        for done, (game_id, details) in enumerate(job.results(), start=1):
+            name = details.get("name") or selected[game_id]['name']
+            progress_bar.progress(done / len(selected), text=lang.get_text("game_management.fetching_progress", done=done, total=len(selected), name=name))
+            if details and details.get("name"):
+                fetched.append(details)
+            else:
+                st.error(lang.get_text("game_management.add_failed") + f" ({selected[game_id]['name']})")
+        for key, kwargs in job.errors:
+            st.error(lang.get_text(key, **kwargs))
+    finally:
+        # 取得できたゲームをまとめて1回で保存（キャンセル・再実行で中断された場合も取得済みの分は保存する）
+        added = dm.add_games(fetched)
+    
+    progress_bar.empty()
+    added_count = len(added or [])
+    if added_count:
+        st.success(lang.get_text("game_management.added_count", count=added_count))
+        # 選択状態をリセット
+        for key in [key for key in st.session_state if str(key).startswith("select_game_")]:
+            del st.session_state[key]
+        time.sleep(0.5)
+        st.rerun()
+
+def _render_collection_import_tab(lang, dm):
+    """コレクション一括取り込みタブの表示"""
+    st.markdown(f"### {lang.get_text('game_management.import_title')}")
+    st.info(lang.get_text("game_management.import_desc"))
+    
+    job = CollectionImportJob(dm)
+    
+    # 中断された取り込みがあれば再開できる
+    if job.has_unfinished():
+        st.warning(lang.get_text("game_management.import_unfinished", fetched=len(job.fetched), pending=len(job.pending)))
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button(lang.get_text("game_management.import_resume", count=len(job.pending)), key="resume_import"):
+                _run_collection_import(lang, job)
+        with col2:
+            if st.button(lang.get_text("game_management.import_discard"), key="discard_import"):
+                job.discard()
+                st.rerun()
+        return
+    
+    uploaded_file = st.file_uploader(lang.get_text("game_management.import_file"), type=["xml"])
+    owned_only = st.checkbox(lang.get_text("game_management.import_owned_only"), value=True)
+    id_text = st.text_area(lang.get_text("game_management.import_ids"), placeholder="13, 822, 68448")
+    
+    if st.button(lang.get_text("game_management.import_start"), key="start_import"):
+        game_ids = parse_id_list(id_text)
+        if uploaded_file is not None:
+            try:
+                game_ids += parse_collection_ids(uploaded_file.getvalue(), owned_only)
+            except Exception:
+                st.error(lang.get_text("errors.bgg_parse_error"))
+                return
+        
+        if not job.start(game_ids):
+            st.info(lang.get_text("game_management.import_nothing"))
+            return
+        _run_collection_import(lang, job)
+
+def _run_collection_import(lang, job):
+    """取り込みの実行（バッチごとに進捗を保存）"""
+    total = len(job.pending) + len(job.fetched) + len(job.failed)
+    progress_bar = st.progress(0.0, text=lang.get_text("game_management.import_progress", done=0, total=total))
+    
+    def on_progress(done, total):
+        progress_bar.progress(done / total, text=lang.get_text("game_management.import_progress", done=done, total=total))
+    
+    added, failed = job.run(on_progress)
+    progress_bar.empty()
+    if added is None:
+        # 保存エラーは表示済み。取得結果は残っているので「再開」で保存し直せる
+        return
+    
+    if failed:
+        st.warning(lang.get_text("game_management.import_failed_ids", ids=", ".join(failed)))
+    if added:
+        st.success(lang.get_text("game_management.import_done", count=len(added)))
+    else:
+        st.info(lang.get_text("game_management.import_nothing"))
+
 def _render_registered_games_tab(lang, dm):
     """登録済みゲームタブの表示"""
     st.markdown(f"### {lang.get_text('game_management.registered_games_title')}")
@@ -139,6 +272,9 @@ def _render_registered_games_tab(lang, dm):
                 label_visibility="visible"
             )
         
+        # 全ゲームの情報を一括更新
+        _render_refresh_all_button(lang, dm, games)
+        
         # ゲームリストをソート
         sorted_games = _sort_games_list(games, sort_option, dm)
         
@@ -156,6 +292,27 @@ def _render_registered_games_tab(lang, dm):
     else:
         st.info(lang.get_text("game_management.no_games"))
 
+def _render_refresh_all_button(lang, dm, games):
+    """全ゲーム情報の一括更新ボタン（BGGへはまとめてリクエスト）"""
+    if not st.button(lang.get_text("game_management.refresh_all"), key="refresh_all_games"):
+        return
+    
+    progress_bar = st.progress(0.0, text=lang.get_text("game_management.refreshing_all", count=len(games)))
+    
+    def on_progress(done, total):
+        progress_bar.progress(done / total, text=lang.get_text("game_management.refreshing_all", count=total))
+    
+    details = BGGApi.get_games_details(list(games), on_progress=on_progress)
+    progress_bar.empty()
+    
+    updated_count = dm.update_games({game_id: data for game_id, data in details.items() if data.get("name")})
+    if updated_count:
+        st.success(lang.get_text("game_management.all_info_updated", count=updated_count, total=len(games)))
+        time.sleep(0.5)
+        st.rerun()
+    else:
+        st.error(lang.get_text("game_management.update_failed"))
+
 def _sort_games_list(games, sort_option, dm):
     """ゲームリストをソート"""
     games_list = list(games.items())
@@ -196,10 +353,15 @@ def _render_game_details(lang, dm, game_id, game):
     col_img, col_info, col_stats = st.columns([1, 2, 1])
     
     with col_img:
-        # 箱絵表示
-        if game.get('image_url'):
+        # 箱絵表示（ディスクに保存したサムネイルを優先し、未取得なら裏で取得しておく）
+        image_source = thumbnail_source(game)
+        if image_source:
             try:
-                st.image(game['image_url'], width=150, caption=lang.get_text("game_management.box_art"))
+                image_cache = get_image_cache()
+                image_path = image_cache.cached_path(image_source, THUMBNAIL_WIDTH)
+                if image_path is None:
+                    image_cache.prefetch(image_source, THUMBNAIL_WIDTH)
+                st.image(image_path or image_source, width=THUMBNAIL_WIDTH, caption=lang.get_text("game_management.box_art"))
             except:
                 st.write(lang.get_text("game_management.image_error"))
         else:
@@ -312,10 +474,11 @@ def _render_game_action_buttons(lang, dm, game_id, game):
             
             if updated_data and updated_data.get("name"):
                 # 既存データを更新（IDは保持）
-                dm.data["games"][game_id].update(updated_data)
-                dm.save_data("games")
-                st.success(lang.get_text("game_management.info_updated", name=updated_data['name']))
-                st.rerun()
+                if dm.update_game(game_id, updated_data):
+                    st.success(lang.get_text("game_management.info_updated", name=updated_data['name']))
+                    st.rerun()
+                else:
+                    st.error(lang.get_text("game_management.update_failed"))
             else:
                 st.error(lang.get_text("game_management.update_failed"))
     
@@ -328,10 +491,9 @@ def _render_game_action_buttons(lang, dm, game_id, game):
         if st.session_state.get(f"confirm_game_delete_{game_id}", False):
             if st.button(lang.get_text("game_management.delete_confirm"), key=f"confirm_game_btn_{game_id}"):
                 # プレイ記録をチェック
-                plays = dm.data.get("plays", [])
-                related_plays = [p for p in plays if p.get("game_id") == game_id]
-                if related_plays:
-                    st.error(lang.get_text("game_management.has_play_records", count=len(related_plays)))
+                related_count = dm.count_plays_for_game(game_id)
+                if related_count:
+                    st.error(lang.get_text("game_management.has_play_records", count=related_count))
                 else:
                     success = dm.delete_game(game_id)
                     if success:
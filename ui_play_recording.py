@@ -266,9 +266,9 @@ def _render_save_button(lang, dm, selected_game_id, basic_info, score_data):
                     "score_sheet_used": score_data["score_sheet"]["name"] if score_data["score_sheet"] else None,
                     "game_type": score_data["score_sheet"].get("game_type", lang.get_text("game_types.competitive")) if score_data["score_sheet"] else lang.get_text("game_types.competitive")
                 }
-                dm.add_play(play_data)
-                st.success(lang.get_text("play_recording.saved_success"))
-                st.rerun()
+                if dm.add_play(play_data):
+                    st.success(lang.get_text("play_recording.saved_success"))
+                    st.rerun()
         else:
             st.error(lang.get_text("play_recording.select_players"))
 
@@ -40,16 +40,10 @@ def _handle_add_player(lang, dm, player_name, player_notes):
                 "created_at": datetime.now().isoformat()
             }
             
-            # playersが存在しない場合は初期化
-            if "players" not in dm.data or dm.data["players"] is None:
-                dm.data["players"] = {}
-            
-            # プレイヤーを追加
-            dm.data["players"][player_name.strip()] = player_data
-            dm.save_data("players")  # プレイヤーデータのみ保存
-            
-            st.success(lang.get_text("player_management.added_success", name=player_name))
-            st.rerun()
+            # プレイヤーを追加（保存できなかった場合はエラー表示済み）
+            if dm.add_player(player_name.strip(), player_data):  # プレイヤーデータのみ保存
+                st.success(lang.get_text("player_management.added_success", name=player_name))
+                st.rerun()
         else:
             st.error(lang.get_text("player_management.already_exists", name=player_name))
     else:
@@ -112,10 +106,9 @@ def _render_player_delete_buttons(lang, dm, player_name):
     with col_del2:
         if st.session_state.get(f"confirm_state_{player_name}", False):
             if st.button(lang.get_text("player_management.delete_player_confirm"), key=f"confirm_btn_{player_name}"):
-                del dm.data["players"][player_name]
-                dm.save_data("players")  # プレイヤーデータのみ保存
-                st.success(lang.get_text("player_management.deleted_success", name=player_name))
-                # 確認状態をリセット
-                if f"confirm_state_{player_name}" in st.session_state:
-                    del st.session_state[f"confirm_state_{player_name}"]
-                st.rerun()
\ No newline at end of file
+                if dm.delete_player(player_name):  # プレイヤーデータのみ保存
+                    st.success(lang.get_text("player_management.deleted_success", name=player_name))
+                    # 確認状態をリセット
+                    if f"confirm_state_{player_name}" in st.session_state:
+                        del st.session_state[f"confirm_state_{player_name}"]
+                    st.rerun()
\ No newline at end of file
@@ -162,13 +162,8 @@ def _render_save_scoresheet_button(lang, dm, selected_game_id, selected_game_nam
         sheet_data = ScoreSheetManager.create_custom_sheet(selected_game_name, st.session_state.score_fields)
         sheet_data["game_type"] = game_type  # ゲームタイプを追加
         
-        # score_sheetsが存在しない場合は初期化
-        if "score_sheets" not in dm.data or dm.data["score_sheets"] is None:
-            dm.data["score_sheets"] = {}
-        
-        dm.data["score_sheets"][selected_game_id] = sheet_data
-        dm.save_data("score_sheets")  # スコアシートデータのみ保存
-        st.success(lang.get_text("scoresheet.saved_success"))
+        if dm.set_score_sheet(selected_game_id, sheet_data):  # スコアシートデータのみ保存
+            st.success(lang.get_text("scoresheet.saved_success"))
 
 def _render_manage_scoresheet_tab(lang, dm):
     """スコアシート管理タブの表示"""
@@ -79,13 +79,21 @@ def _create_backup(lang, dm):
         backup_dir = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         os.makedirs(backup_dir, exist_ok=True)
         
+        # ジャーナル分もplays.yamlに含めるため先に統合
+        dm.compact_plays()
+        
         # 各データファイルをバックアップ
         backup_count = 0
-        for data_type, file_path in dm.files.items():
-            if os.path.exists(file_path):
-                backup_path = os.path.join(backup_dir, f"{data_type}.yaml")
-                shutil.copy2(file_path, backup_path)
-                backup_count += 1
+        if dm.storage:
+            # SQLiteはオンラインバックアップでDBファイルごと複製
+            dm.storage.backup(os.path.join(backup_dir, os.path.basename(dm.storage.db_path)))
+            backup_count += 1
+        else:
+            for data_type, file_path in dm.files.items():
+                if os.path.exists(file_path):
+                    backup_path = os.path.join(backup_dir, f"{data_type}.yaml")
+                    shutil.copy2(file_path, backup_path)
+                    backup_count += 1
         
         if backup_count > 0:
             st.success(lang.get_text("settings.backup_created", dir=backup_dir))
@@ -103,19 +111,19 @@ def _render_data_stats_section(lang, dm):
     
     with col1:
         games_label = lang.get_text("settings.games_label").replace("🎲 ", "")
-        st.metric(games_label, len(dm.data.get("games", {})))
+        st.metric(games_label, dm.count("games"))
     
     with col2:
         players_label = lang.get_text("settings.players_label").replace("👥 ", "")
-        st.metric(players_label, len(dm.data.get("players", {})))
+        st.metric(players_label, dm.count("players"))
     
     with col3:
         plays_label = lang.get_text("settings.plays_label").replace("🎮 ", "")
-        st.metric(plays_label, len(dm.data.get("plays", [])))
+        st.metric(plays_label, dm.count("plays"))
     
     with col4:
         scoresheets_label = lang.get_text("settings.scoresheets_label").replace("📊 ", "")
-        st.metric(scoresheets_label, len(dm.data.get("score_sheets", {})))
+        st.metric(scoresheets_label, dm.count("score_sheets"))
 
 def _render_data_directory_section(lang, dm):
     """データディレクトリセクションの表示"""
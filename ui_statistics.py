@@ -1,7 +1,8 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
-from datetime import datetime
+from rating_engine import HISTORY_FIELDS as RATING_HISTORY_FIELDS
 
 def render_statistics_page():
     """統計ページ表示"""
@@ -15,98 +16,91 @@ def render_statistics_page():
         st.info(lang.get_text("statistics.need_plays"))
         return
     
-    tab1, tab2, tab3 = st.tabs([
+    tab1, tab2, tab3, tab4 = st.tabs([
         lang.get_text("statistics.overall_tab"), 
         lang.get_text("statistics.by_game_tab"), 
-        lang.get_text("statistics.by_player_tab")
+        lang.get_text("statistics.by_player_tab"),
+        lang.get_text("statistics.head_to_head_tab")
     ])
     
+    # 列指向のプレイ記録（データが変わったときだけ構築）
+    frames = dm.get_play_frames()
+    
     with tab1:
-        _render_overall_statistics(lang, dm, plays)
+        _render_overall_statistics(lang, dm, frames)
     
     with tab2:
-        _render_game_statistics(lang, dm, plays)
+        _render_game_statistics(lang, dm, frames)
     
     with tab3:
-        _render_player_statistics(lang, dm, plays)
+        _render_player_statistics(lang, dm, frames)
+    
+    with tab4:
+        _render_head_to_head(lang, dm)
 
-def _render_overall_statistics(lang, dm, plays):
+def _render_overall_statistics(lang, dm, frames):
     """全体統計の表示"""
     st.markdown(f"### {lang.get_text('statistics.overall_stats')}")
     
     # 基本統計メトリクス
-    _render_overall_metrics(lang, plays)
+    _render_overall_metrics(lang, frames)
     
     # 月別プレイ回数グラフ
-    _render_monthly_plays_chart(lang, plays)
+    _render_monthly_plays_chart(lang, frames)
 
-def _render_overall_metrics(lang, plays):
+def _render_overall_metrics(lang, frames):
     """全体統計メトリクスの表示"""
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric(lang.get_text("statistics.total_plays"), len(plays))
+        st.metric(lang.get_text("statistics.total_plays"), frames.total_plays)
     
     with col2:
-        total_time = sum(play.get("duration", 0) for play in plays)
-        st.metric(lang.get_text("statistics.total_time"), f"{total_time}{lang.get_text('game_management.minutes')}")
+        st.metric(lang.get_text("statistics.total_time"), f"{frames.total_duration}{lang.get_text('game_management.minutes')}")
     
     with col3:
-        avg_time = total_time / len(plays) if plays else 0
-        st.metric(lang.get_text("statistics.avg_time"), f"{avg_time:.1f}{lang.get_text('game_management.minutes')}")
+        st.metric(lang.get_text("statistics.avg_time"), f"{frames.avg_duration:.1f}{lang.get_text('game_management.minutes')}")
     
     with col4:
-        unique_games = len(set(play.get("game_id") for play in plays))
-        st.metric(lang.get_text("statistics.unique_games"), unique_games)
+        st.metric(lang.get_text("statistics.unique_games"), frames.plays["game_id"].nunique())
 
-def _render_monthly_plays_chart(lang, plays):
+def _render_monthly_plays_chart(lang, frames):
     """月別プレイ回数グラフの表示"""
     st.markdown(f"### {lang.get_text('statistics.monthly_plays')}")
     
-    # 日付データの処理
-    play_dates = []
-    for play in plays:
-        try:
-            play_date = datetime.fromisoformat(play.get("date", "2024-01-01"))
-            play_dates.append(play_date)
-        except ValueError:
-            # 無効な日付の場合はデフォルト値を使用
-            play_dates.append(datetime(2024, 1, 1))
-    
-    df_plays = pd.DataFrame({"date": play_dates})
-    df_plays["month"] = df_plays["date"].dt.to_period("M")
-    monthly_counts = df_plays.groupby("month").size()
+    # 月別の集計値（時系列順）
+    monthly = frames.monthly_counts()
     
     fig = px.bar(
-        x=monthly_counts.index.astype(str), 
-        y=monthly_counts.values,
+        x=monthly.index, 
+        y=monthly.to_numpy(),
         labels={"x": lang.get_text("statistics.month_label"), "y": lang.get_text("statistics.play_count_label")}
     )
     st.plotly_chart(fig, use_container_width=True)
 
-def _render_game_statistics(lang, dm, plays):
+def _render_game_statistics(lang, dm, frames):
     """ゲーム別統計の表示"""
     st.markdown(f"### {lang.get_text('statistics.game_stats')}")
     
-    # ゲーム別プレイ回数の集計
-    game_counts = _calculate_game_counts(lang, dm, plays)
+    # ゲーム別の集計（1回のgroupby）
+    game_totals = frames.game_totals()
+    game_counts = _calculate_game_counts(lang, dm, game_totals)
     
     if game_counts:
         # 円グラフの表示
         _render_game_play_ratio_chart(lang, game_counts)
         
         # 詳細テーブルの表示
-        _render_game_details_table(lang, dm)
+        _render_game_details_table(lang, dm, game_totals)
     else:
         st.info(lang.get_text("play_recording.no_plays"))
 
-def _calculate_game_counts(lang, dm, plays):
+def _calculate_game_counts(lang, dm, game_totals):
     """ゲーム別プレイ回数の計算"""
     game_counts = {}
-    for play in plays:
-        game_id = play.get("game_id")
+    for game_id, play_count in game_totals["plays"].items():
         game_name = dm.get_localized_game_name(game_id)
-        game_counts[game_name] = game_counts.get(game_name, 0) + 1
+        game_counts[game_name] = game_counts.get(game_name, 0) + int(play_count)
     return game_counts
 
 def _render_game_play_ratio_chart(lang, game_counts):
@@ -118,13 +112,16 @@ def _render_game_play_ratio_chart(lang, game_counts):
     )
     st.plotly_chart(fig, use_container_width=True)
 
-def _render_game_details_table(lang, dm):
+def _render_game_details_table(lang, dm, game_totals):
     """ゲーム詳細テーブルの表示"""
     st.markdown(f"#### {lang.get_text('statistics.game_details')}")
     
+    play_counts = game_totals["plays"].to_dict()
+    avg_durations = game_totals["avg_duration"].to_dict()
     game_stats = []
     for game_id, game in dm.data.get("games", {}).items():
-        stats = dm.get_game_stats(game_id)
+        play_count = int(play_counts.get(game_id, 0))
+        avg_duration = avg_durations.get(game_id, 0)
         localized_name = dm.get_localized_game_name(game_id)
         
         # ランキング情報も含める
@@ -134,8 +131,8 @@ def _render_game_details_table(lang, dm):
         game_stats.append({
             lang.get_text("game_management.game_name"): localized_name,
             "BGG Ranking": ranking_text,
-            lang.get_text("statistics.play_count_label"): stats.get("total_plays", 0),
-            lang.get_text("statistics.avg_time_label"): f"{stats.get('avg_duration', 0):.1f}{lang.get_text('game_management.minutes')}"
+            lang.get_text("statistics.play_count_label"): play_count,
+            lang.get_text("statistics.avg_time_label"): f"{avg_duration:.1f}{lang.get_text('game_management.minutes')}"
         })
     
     df_game_stats = pd.DataFrame(game_stats)
@@ -167,83 +164,156 @@ def _render_game_details_table(lang, dm):
     
     st.dataframe(df_game_stats, use_container_width=True)
 
-def _render_player_statistics(lang, dm, plays):
+def _render_player_statistics(lang, dm, frames):
     """プレイヤー別統計の表示"""
     st.markdown(f"### {lang.get_text('statistics.player_stats')}")
     
     # プレイヤー別勝利数の計算
-    player_stats_data = _calculate_player_stats(plays)
+    player_totals = _calculate_player_stats(frames)
     
-    if player_stats_data["player_wins"]:
+    if player_totals["wins"].any():
         # 統計テーブルの表示
-        _render_player_stats_table(lang, player_stats_data)
+        _render_player_stats_table(lang, dm, player_totals)
     else:
         st.info(lang.get_text("play_recording.no_plays"))
+    
+    # レーティング（対戦相手の強さを考慮した実力）
+    _render_player_ratings(lang, dm)
 
-def _calculate_player_stats(plays):
-    """プレイヤー統計の計算（協力ゲーム対応版）"""
-    player_wins = {}
-    player_games = {}
-    
-    for play in plays:
-        scores = play.get("scores", {})
-        if scores:
-            # 協力ゲームかどうかをチェック
-            game_type = play.get("game_type", "")
-            is_cooperative = (game_type == "協力ゲーム" or game_type == "Cooperative Game")
-            
-            # 各プレイヤーの参加ゲーム数をカウント
-            for player in scores.keys():
-                player_games[player] = player_games.get(player, 0) + 1
-            
-            if is_cooperative:
-                # 協力ゲームの場合は全体結果で勝敗判定
-                detailed_scores = play.get("detailed_scores", {})
-                global_data = detailed_scores.get("global", {}) if detailed_scores else {}
-                
-                # ゲーム結果をチェック
-                game_result = ""
-                for key, value in global_data.items():
-                    if "結果" in key or "Result" in key or key == "ゲーム結果":
-                        game_result = str(value)
-                        break
-                
-                # 勝利判定 - 協力ゲームでは全員が同じ結果
-                if "勝利" in game_result or "Victory" in game_result or "Win" in game_result:
-                    # 全員に勝利を加算
-                    for player in scores.keys():
-                        player_wins[player] = player_wins.get(player, 0) + 1
-                # 敗北の場合は誰にも勝利を加算しない
-                
-            else:
-                # 対戦ゲームの場合は最高スコアで勝敗判定（従来通り）
-                winner = max(scores.items(), key=lambda x: x[1])[0]
-                player_wins[winner] = player_wins.get(winner, 0) + 1
-    
-    return {
-        "player_wins": player_wins,
-        "player_games": player_games
-    }
+def _calculate_player_stats(frames):
+    """プレイヤー統計の計算（協力ゲーム対応版）- 保存時に確定した勝者から一括集計"""
+    return frames.player_totals()
 
-def _render_player_stats_table(lang, player_stats_data):
+def _render_player_stats_table(lang, dm, player_totals):
     """プレイヤー統計テーブルの表示"""
-    player_wins = player_stats_data["player_wins"]
-    player_games = player_stats_data["player_games"]
-    
-    # 統計データの構築
-    player_stats = []
-    for player in player_games.keys():
-        wins = player_wins.get(player, 0)
-        total = player_games[player]
-        win_rate = (wins / total * 100) if total > 0 else 0
-        player_stats.append({
-            lang.get_text("player_management.name_label"): player,
-            lang.get_text("statistics.win_count_label"): wins,
-            lang.get_text("statistics.play_count_label"): total,
-            lang.get_text("statistics.win_rate_label"): f"{win_rate:.1f}%"
-        })
+    # 勝率の信頼区間（オプション）- 全体またはゲーム別
+    intervals = None
+    if st.checkbox(lang.get_text("statistics.show_win_rate_intervals"), key="show_win_rate_intervals"):
+        method_labels = {
+            lang.get_text("statistics.interval_bayes"): "bayes",
+            lang.get_text("statistics.interval_bootstrap"): "bootstrap"
+        }
+        col1, col2 = st.columns(2)
+        with col1:
+            method = method_labels[st.radio(lang.get_text("statistics.interval_method"), list(method_labels), horizontal=True, key="win_rate_interval_method")]
+        with st.spinner(lang.get_text("common.loading")):
+            win_rate_intervals = dm.get_win_rate_intervals(method)
+        with col2:
+            overall_label = lang.get_text("statistics.ratings_overall")
+            game_options = {dm.get_localized_game_name(game_id): game_id for game_id in win_rate_intervals.game_ids()}
+            scope = st.selectbox(lang.get_text("statistics.win_rate_interval_scope"), [overall_label] + sorted(game_options), key="win_rate_interval_scope")
+        game_id = game_options.get(scope)
+        intervals = win_rate_intervals.overall() if game_id is None else win_rate_intervals.for_game(game_id)
+        # ゲーム別の場合はそのゲームでの勝利数・参加数を表示
+        player_totals = intervals if game_id is not None else player_totals
+        st.caption(lang.get_text("statistics.win_rate_interval_note", level=round(win_rate_intervals.level * 100)))
+    
+    # 統計データの構築（列ごとにまとめて整形）
+    df_player_stats = pd.DataFrame({
+        lang.get_text("player_management.player_name"): player_totals.index.astype(str),
+        lang.get_text("statistics.win_count_label"): player_totals["wins"].to_numpy(),
+        lang.get_text("statistics.play_count_label"): player_totals["plays"].to_numpy(),
+        lang.get_text("statistics.win_rate_label"): (player_totals["win_rate"] * 100).map("{:.1f}%".format).to_numpy()
+    })
+    if intervals is not None:
+        bounds = intervals.reindex(player_totals.index.astype(str))
+        df_player_stats[lang.get_text("statistics.win_rate_interval_label")] = [
+            f"{lower * 100:.1f}% - {upper * 100:.1f}%" if pd.notna(lower) else ""
+            for lower, upper in zip(bounds["lower"], bounds["upper"])
+        ]
     
     # テーブルの表示
-    df_player_stats = pd.DataFrame(player_stats)
     df_player_stats = df_player_stats.sort_values(lang.get_text("statistics.win_count_label"), ascending=False)
-    st.dataframe(df_player_stats, use_container_width=True)
\ No newline at end of file
+    st.dataframe(df_player_stats, use_container_width=True)
+
+def _render_player_ratings(lang, dm):
+    """レーティングの表示（全体・ゲーム別）"""
+    st.markdown(f"### {lang.get_text('statistics.ratings_title')}")
+    st.caption(lang.get_text("statistics.ratings_note"))
+    
+    ratings = dm.get_ratings()
+    if not ratings.ratings:
+        st.info(lang.get_text("statistics.no_ratings"))
+        return
+    
+    # 全体またはゲームを選択
+    overall_label = lang.get_text("statistics.ratings_overall")
+    game_options = {dm.get_localized_game_name(game_id): game_id for game_id, players in ratings.game_ratings.items() if players}
+    scope = st.selectbox(lang.get_text("statistics.ratings_scope"), [overall_label] + sorted(game_options))
+    game_id = game_options.get(scope)
+    
+    current = ratings.ratings if game_id is None else ratings.game_ratings[game_id]
+    df_ratings = pd.DataFrame({
+        lang.get_text("player_management.player_name"): list(current),
+        lang.get_text("statistics.rating_label"): [round(rating) for rating in current.values()]
+    })
+    if game_id is None:
+        df_ratings[lang.get_text("statistics.rated_plays_label")] = [ratings.rated_plays.get(player, 0) for player in current]
+    df_ratings = df_ratings.sort_values(lang.get_text("statistics.rating_label"), ascending=False)
+    st.dataframe(df_ratings, use_container_width=True, hide_index=True)
+    
+    _render_rating_history_chart(lang, dm, game_id)
+
+def _render_rating_history_chart(lang, dm, game_id):
+    """レーティング推移グラフの表示（保存済みの履歴を使用）"""
+    history = pd.DataFrame(dm.get_rating_history(), columns=list(RATING_HISTORY_FIELDS))
+    if game_id is not None:
+        history = history[history["game_id"] == game_id].assign(rating=lambda df: df["game_rating"])
+    if history.empty:
+        return
+    
+    # 1日に複数回プレイした場合はその日の最後の値
+    daily = history.groupby(["date", "player"], sort=True)["rating"].last().reset_index()
+    fig = px.line(
+        daily, x="date", y="rating", color="player", markers=len(daily) < 500,
+        title=lang.get_text("statistics.rating_history"),
+        labels={"date": lang.get_text("statistics.date_label"), "rating": lang.get_text("statistics.rating_label"),
+                "player": lang.get_text("player_management.player_name")}
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+def _render_head_to_head(lang, dm):
+    """対戦成績（プレイヤー同士の勝ち・負け・引き分け）の表示"""
+    st.markdown(f"### {lang.get_text('statistics.head_to_head_title')}")
+    st.caption(lang.get_text("statistics.head_to_head_note"))
+    
+    head_to_head = dm.get_head_to_head()
+    game_ids = head_to_head.game_ids()
+    if not game_ids:
+        st.info(lang.get_text("statistics.head_to_head_no_data"))
+        return
+    
+    # 全ゲームまたはゲームを選択
+    overall_label = lang.get_text("statistics.ratings_overall")
+    game_options = {dm.get_localized_game_name(game_id): game_id for game_id in game_ids}
+    scope = st.selectbox(lang.get_text("statistics.head_to_head_scope"), [overall_label] + sorted(game_options), key="head_to_head_scope")
+    game_id = game_options.get(scope)
+    
+    wins, losses, ties = head_to_head.matrices(game_id)
+    games = wins + losses + ties
+    # 対戦のあるプレイヤーだけを表示
+    active = np.flatnonzero(games.sum(axis=1))
+    players = [head_to_head.players[i] for i in active]
+    wins, losses, ties, games = (matrix[np.ix_(active, active)] for matrix in (wins, losses, ties, games))
+    
+    with np.errstate(invalid="ignore", divide="ignore"):
+        win_rates = np.where(games > 0, (wins + 0.5 * ties) / games * 100, np.nan)
+    records = np.where(games > 0, np.char.add(np.char.add(np.char.add(np.char.add(wins.astype(str), "-"), losses.astype(str)), "-"), ties.astype(str)), "")
+    
+    fig = px.imshow(
+        win_rates, x=players, y=players, zmin=0, zmax=100, color_continuous_scale="RdBu", aspect="auto",
+        labels={"x": lang.get_text("statistics.opponent_label"), "y": lang.get_text("player_management.player_name"),
+                "color": lang.get_text("statistics.win_rate_label")}
+    )
+    fig.update_traces(text=records, texttemplate="%{text}", hovertemplate="%{y} vs %{x}<br>%{text}<br>%{z:.1f}%<extra></extra>")
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # 表形式（対戦数の多い順）
+    df_records = head_to_head.records(game_id).sort_values("games", ascending=False)
+    df_records = pd.DataFrame({
+        lang.get_text("player_management.player_name"): df_records["player"],
+        lang.get_text("statistics.opponent_label"): df_records["opponent"],
+        lang.get_text("statistics.head_to_head_record"): df_records["wins"].astype(str) + "-" + df_records["losses"].astype(str) + "-" + df_records["ties"].astype(str),
+        lang.get_text("statistics.win_rate_label"): (df_records["win_rate"] * 100).map("{:.1f}%".format)
+    })
+    st.dataframe(df_records, use_container_width=True, hide_index=True)
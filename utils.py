@@ -1,43 +1,70 @@
+# 協力ゲームを表すゲームタイプ（日本語・英語）
+COOPERATIVE_GAME_TYPES = ("協力ゲーム", "Cooperative Game")
+
+def get_play_winners(play):
+    """プレイの勝者一覧を取得（協力ゲーム対応）"""
+    # 保存時に確定した勝者があればそれを使う
+    if "winners" in play:
+        return list(play["winners"] or [])
+    return derive_play_winners(play)
+
+def is_cooperative_play(play):
+    """協力ゲームのプレイかどうか"""
+    if "cooperative" in play:
+        return bool(play["cooperative"])
+    return play.get("game_type", "") in COOPERATIVE_GAME_TYPES
+
+def play_result_fields(play):
+    """保存時に記録する勝敗（勝者一覧と協力ゲームかどうか）"""
+    return {
+        "winners": derive_play_winners(play),
+        "cooperative": play.get("game_type", "") in COOPERATIVE_GAME_TYPES
+    }
+
+def ensure_play_result_fields(play):
+    """勝敗が記録されていない（旧形式の）プレイ記録に補う"""
+    if "winners" not in play or "cooperative" not in play:
+        play.update(play_result_fields(play))
+    return play
+
+def derive_play_winners(play):
+    """スコア・ゲーム結果から勝者一覧を求める（保存時と旧形式の記録の読み込み時のみ）"""
+    scores = play.get("scores", {})
+    if not scores:
+        return []
+    
+    # 協力ゲームかどうかをチェック
+    if play.get("game_type", "") in COOPERATIVE_GAME_TYPES:
+        # 協力ゲームの場合は全体結果で勝敗判定
+        detailed_scores = play.get("detailed_scores", {})
+        global_data = detailed_scores.get("global", {}) if detailed_scores else {}
+        
+        # ゲーム結果をチェック
+        game_result = ""
+        for key, value in global_data.items():
+            if "結果" in key or "Result" in key or key == "ゲーム結果":
+                game_result = str(value)
+                break
+        
+        # 勝利判定 - 協力ゲームでは全員が同じ結果
+        if "勝利" in game_result or "Victory" in game_result or "Win" in game_result:
+            return list(scores.keys())
+        # 敗北の場合は勝者なし
+        return []
+    
+    # 対戦ゲームの場合は最高スコアで勝敗判定（従来通り）
+    # 同点時は保存・再読み込みで順序が変わらないよう名前順で先のプレイヤー
+    winner = max(sorted(scores.items()), key=lambda x: x[1])[0]
+    return [winner]
+
 def get_player_statistics(dm, player_name):
     """プレイヤーの統計情報を取得"""
-    total_plays = 0
-    wins = 0
-    
-    plays = dm.data.get("plays", [])
-    for play in plays:
-        scores = play.get("scores", {})
-        if player_name in scores:
-            total_plays += 1
-            
-            # 協力ゲームかどうかをチェック
-            game_type = play.get("game_type", "")
-            is_cooperative = (game_type == "協力ゲーム" or game_type == "Cooperative Game")
-            
-            if is_cooperative:
-                # 協力ゲームの場合は全体結果で勝敗判定
-                detailed_scores = play.get("detailed_scores", {})
-                global_data = detailed_scores.get("global", {}) if detailed_scores else {}
-                
-                # ゲーム結果をチェック
-                game_result = ""
-                for key, value in global_data.items():
-                    if "結果" in key or "Result" in key or key == "ゲーム結果":
-                        game_result = str(value)
-                        break
-                
-                # 勝利判定
-                if "勝利" in game_result or "Victory" in game_result or "Win" in game_result:
-                    wins += 1
-                # 敗北の場合は勝利数に加算しない
-                
-            else:
-                # 対戦ゲームの場合は最高スコアで勝敗判定（従来通り）
-                if scores:
-                    winner = max(scores.items(), key=lambda x: x[1])[0]
-                    if winner == player_name:
-                        wins += 1
+    # 統計画面と同じ列指向データの集計から取得
+    player_totals = dm.get_play_frames().player_totals()
+    if player_name not in player_totals.index:
+        return {"total_plays": 0, "wins": 0}
     
     return {
-        "total_plays": total_plays,
-        "wins": wins
-    }
\ No newline at end of file
+        "total_plays": int(player_totals.at[player_name, "plays"]),
+        "wins": int(player_totals.at[player_name, "wins"])
+    }
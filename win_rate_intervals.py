@@ -0,0 +1,167 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+
+# 区間の種類: Beta事後分布（Jeffreys事前分布）またはプレイ単位のブートストラップ
+METHODS = ("bayes", "bootstrap")
+DEFAULT_LEVEL = 0.95
+DEFAULT_RESAMPLES = 1000
+POSTERIOR_GRID_SIZE = 2000
+DEFAULT_SEED = 0
+# 1回の一括計算で扱う (リサンプル数 × スコア行数)・(グループ数 × 格子点数) の上限（メモリ使用量の目安）
+BATCH_CELLS = 2_000_000
+# (リサンプル数 × スコア行数) がこれを超えたらプロセスプールで分担
+PARALLEL_MIN_CELLS = 20_000_000
+MAX_WORKERS = max(1, min(4, (os.cpu_count() or 1)))
+
+class WinRateIntervals:
+    """勝率の信頼区間（プレイヤー別・プレイヤー×ゲーム別）
+
+    table: game_id（全体はNone）, player, plays, wins, win_rate, lower, upper
+    """
+
+    def __init__(self, table: pd.DataFrame, method: str, level: float, version=None):
+        self.table = table
+        self.method = method
+        self.level = level
+        self.version = version
+
+    @classmethod
+    def from_frames(cls, frames, method: str = "bayes", level: float = DEFAULT_LEVEL,
+                    resamples: int = DEFAULT_RESAMPLES, seed: int = DEFAULT_SEED,
+                    max_workers: int = MAX_WORKERS, version=None) -> "WinRateIntervals":
+        """縦持ちスコアから全体とゲーム別の区間を一括計算"""
+        if method not in METHODS:
+            raise ValueError(f"Unknown interval method: {method}")
+        scores = frames.scores.merge(frames.plays[["play_id", "game_id"]], on="play_id", how="left")
+
+        # 全体（プレイヤー単位）とゲーム別（ゲーム×プレイヤー単位）の行を並べて同時に集計
+        players = scores["player"].cat.codes.to_numpy(dtype=np.int64)
+        games = scores["game_id"].cat.codes.to_numpy(dtype=np.int64)
+        size = len(scores["player"].cat.categories)
+        has_game = games >= 0
+        raw_groups = np.concatenate([players, size + games[has_game] * size + players[has_game]])
+        group_keys, groups = np.unique(raw_groups, return_inverse=True)
+        _, play_codes = np.unique(scores["play_id"].to_numpy(), return_inverse=True)
+        play_index = np.concatenate([play_codes, play_codes[has_game]])
+        winners = np.concatenate([scores["is_winner"].to_numpy(), scores["is_winner"].to_numpy()[has_game]]).astype(np.float64)
+
+        plays = np.bincount(groups, minlength=len(group_keys))
+        wins = np.bincount(groups, weights=winners, minlength=len(group_keys))
+        alpha = (1 - level) / 2
+        if method == "bayes":
+            lower, upper = beta_intervals(wins, plays, alpha)
+        else:
+            lower, upper = bootstrap_intervals(play_index, groups, winners, len(group_keys), alpha,
+                                               resamples=resamples, seed=seed, max_workers=max_workers)
+
+        player_names = scores["player"].cat.categories
+        game_ids = scores["game_id"].cat.categories
+        # グループ番号を (ゲーム, プレイヤー) に戻す
+        is_game = group_keys >= size
+        game_codes, player_codes = np.divmod(np.where(is_game, group_keys - size, group_keys), max(size, 1))
+        table = pd.DataFrame({
+            "game_id": [game_ids[code] if game else None for game, code in zip(is_game, game_codes)],
+            "player": np.asarray(player_names, dtype=object)[player_codes],
+            "plays": plays,
+            "wins": wins.astype(np.int64),
+            "win_rate": wins / np.maximum(plays, 1),
+            "lower": lower,
+            "upper": upper,
+        })
+        return cls(table, method, level, version)
+
+    def overall(self) -> pd.DataFrame:
+        """プレイヤー別の区間（player をインデックスに持つ）"""
+        return self.table[self.table["game_id"].isna()].set_index("player")
+
+    def for_game(self, game_id) -> pd.DataFrame:
+        """指定ゲームでのプレイヤー別の区間（player をインデックスに持つ）"""
+        return self.table[self.table["game_id"] == game_id].set_index("player")
+
+    def game_ids(self) -> List:
+        """区間のあるゲーム"""
+        return list(self.table["game_id"].dropna().unique())
+
+def beta_intervals(wins: np.ndarray, plays: np.ndarray, alpha: float,
+                   grid_size: int = POSTERIOR_GRID_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """Beta(勝ち+0.5, 負け+0.5) 事後分布の等裾区間（密度を格子上で積分し、グループをまとめて分位点を求める）"""
+    lower = np.empty(len(plays))
+    upper = np.empty(len(plays))
+    # 各セルの中点での対数密度（正規化定数は累積後の割り算で消える）
+    x = (np.arange(grid_size) + 0.5) / grid_size
+    log_x, log_1mx = np.log(x), np.log1p(-x)
+    chunk = max(1, BATCH_CELLS // grid_size)
+    for start in range(0, len(plays), chunk):
+        a = (wins[start:start + chunk] + 0.5)[:, None]
+        b = (plays[start:start + chunk] - wins[start:start + chunk] + 0.5)[:, None]
+        log_density = (a - 1) * log_x + (b - 1) * log_1mx
+        cdf = np.cumsum(np.exp(log_density - log_density.max(axis=1, keepdims=True)), axis=1)
+        cdf /= cdf[:, -1:]
+        lower[start:start + chunk] = _grid_quantile(cdf, alpha)
+        upper[start:start + chunk] = _grid_quantile(cdf, 1 - alpha)
+    return lower, upper
+
+def _grid_quantile(cdf: np.ndarray, q: float) -> np.ndarray:
+    """格子上の累積分布から分位点を線形補間で求める（行ごと）"""
+    grid_size = cdf.shape[1]
+    rows = np.arange(len(cdf))
+    index = np.minimum((cdf < q).sum(axis=1), grid_size - 1)
+    upper = cdf[rows, index]
+    lower = np.where(index > 0, cdf[rows, np.maximum(index - 1, 0)], 0.0)
+    fraction = np.clip((q - lower) / np.maximum(upper - lower, 1e-300), 0, 1)
+    return (index + fraction) / grid_size
+
+def bootstrap_intervals(play_index: np.ndarray, groups: np.ndarray, winners: np.ndarray, group_count: int,
+                        alpha: float, resamples: int = DEFAULT_RESAMPLES, seed: int = DEFAULT_SEED,
+                        max_workers: int = MAX_WORKERS) -> Tuple[np.ndarray, np.ndarray]:
+    """プレイ単位のブートストラップによるパーセンタイル区間（同じプレイの参加者はまとめて再抽出）"""
+    if len(groups) == 0:
+        return np.empty(0), np.empty(0)
+    # 行をグループ順（同じグループ内は勝ちの行が先）に並べ、各グループを連続した区間にする
+    is_winner = winners > 0
+    order = np.lexsort((~is_winner, groups))
+    plays = np.bincount(groups, minlength=group_count)
+    ends = np.cumsum(plays)
+    segments = (ends - plays, ends, ends - plays + np.bincount(groups, weights=is_winner, minlength=group_count).astype(np.int64))
+
+    # リサンプルを分割し、それぞれ独立した乱数列で計算
+    workers = max_workers if resamples * len(groups) >= PARALLEL_MIN_CELLS else 1
+    chunks = np.array_split(np.arange(resamples), workers)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    tasks = [(play_index[order], segments, len(chunk), chunk_seed) for chunk, chunk_seed in zip(chunks, seeds)]
+    if workers > 1:
+        # Streamlitのサーバーはマルチスレッドなので fork ではなく spawn で子プロセスを起動
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            rates = list(executor.map(_bootstrap_rates, tasks))
+    else:
+        rates = [_bootstrap_rates(task) for task in tasks]
+    rates = np.concatenate(rates)
+    lower, upper = np.nanquantile(rates, [alpha, 1 - alpha], axis=0)
+    return lower, upper
+
+def _bootstrap_rates(task) -> np.ndarray:
+    """リサンプルごとの勝率（リサンプル数 × グループ数）- 複数リサンプルをまとめて累積和の差で集計"""
+    play_index, (starts, ends, win_ends), resamples, seed = task
+    rng = np.random.default_rng(seed)
+    play_count = int(play_index.max()) + 1
+    rows = len(play_index)
+    batch = max(1, min(resamples, BATCH_CELLS // rows))
+    rates = np.empty((resamples, len(starts)))
+    for start in range(0, resamples, batch):
+        count = min(batch, resamples - start)
+        # 各プレイが何回選ばれたか（プレイ数だけ復元抽出）
+        picks = rng.integers(0, play_count, size=(count, play_count))
+        offsets = np.arange(count)[:, None] * play_count
+        weights = np.bincount((picks + offsets).ravel(), minlength=count * play_count).reshape(count, play_count)
+        # 行の重みの累積和から、グループの区間（全体・勝ちの行）ごとの合計を取り出す
+        totals = np.zeros((count, rows + 1), dtype=np.int64)
+        np.cumsum(weights[:, play_index], axis=1, out=totals[:, 1:])
+        plays = totals[:, ends] - totals[:, starts]
+        wins = totals[:, win_ends] - totals[:, starts]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rates[start:start + count] = wins / plays
+    return rates
@@ -0,0 +1,202 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import yaml
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windowsではプロセス間ロックなし
+    fcntl = None
+
+# ファイル先頭に付けるヘッダー行（YAMLとしてはコメントなので既存ツールでも読める）
+HEADER_PREFIX = b"# tabletop-tracker"
+
+# libyaml があればC実装のローダー・ダンパーを使用
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+SafeDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+class ChecksumMismatchError(Exception):
+    """本文のチェックサムがヘッダーと一致しない"""
+
+    def __init__(self, path: str, data, generation: int):
+        super().__init__(path)
+        self.path = path
+        self.data = data
+        self.generation = generation
+
+# スレッドごとに保持中のロック（同じファイルの入れ子ロックで自分を待たないため）
+_held_locks = threading.local()
+
+@contextmanager
+def file_lock(path: str, exclusive: bool = True):
+    """データファイル単位のプロセス間アドバイザリロック（<path>.lock をflock）"""
+    held = getattr(_held_locks, "paths", None)
+    if held is None:
+        held = _held_locks.paths = {}
+    lock_path = f"{path}.lock"
+    if fcntl is None or lock_path in held:
+        yield
+        return
+
+    with open(lock_path, 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        held[lock_path] = exclusive
+        try:
+            yield
+        finally:
+            del held[lock_path]
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def file_signature(path: str):
+    """変更検出用のファイル署名（inode, サイズ, mtime）。無ければNone"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+def backup_path(path: str) -> str:
+    """直前の世代を保持するファイルのパス"""
+    return f"{path}.bak"
+
+def parse_header(line: bytes) -> Dict:
+    """ヘッダー行を解析（ヘッダーでなければ空辞書）"""
+    if not line.startswith(HEADER_PREFIX):
+        return {}
+    header = {}
+    for field in line[len(HEADER_PREFIX):].decode('ascii', 'replace').split():
+        key, _, value = field.partition("=")
+        header[key] = value
+    for key in ("generation", "count"):
+        if key in header:
+            header[key] = int(header[key])
+    return header
+
+def read_header(path: str) -> Dict:
+    """ファイル先頭のヘッダーのみ読み込み"""
+    try:
+        with open(path, 'rb') as f:
+            return parse_header(f.readline())
+    except OSError:
+        return {}
+
+def read_yaml_file(path: str, cache_path: str = None) -> Tuple[any, int]:
+    """YAMLファイル読み込み（データ, 世代番号）。cache_path があればバイナリキャッシュを利用"""
+    if cache_path:
+        cached = _load_snapshot_cache(path, cache_path)
+        if cached is not None:
+            return cached
+
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        raw = f.read()
+
+    first_line, newline, rest = raw.partition(b"\n")
+    header = parse_header(first_line)
+    body = rest if header else raw
+    generation = header.get("generation", 0)
+
+    data = yaml.load(body.decode('utf-8'), Loader=SafeLoader)
+    digest = hashlib.sha256(body).hexdigest()
+    if header.get("sha256") and digest != header["sha256"]:
+        # アプリ外で編集された・途中で切れた等（解析できた内容は呼び出し側で判断）
+        raise ChecksumMismatchError(path, data, generation)
+    if cache_path:
+        _save_snapshot_cache(cache_path, _cache_key(digest, stat), data, generation)
+    return data, generation
+
+def write_yaml_file(path: str, data: any, generation: int, cache_path: str = None):
+    """YAMLファイルをアトミックに保存（一時ファイル → fsync → rename）"""
+    body = yaml.dump(data, Dumper=SafeDumper, allow_unicode=True, default_flow_style=False).encode('utf-8')
+    digest = hashlib.sha256(body).hexdigest()
+    header = f"{HEADER_PREFIX.decode('ascii')} generation={generation} sha256={digest}"
+    if isinstance(data, (dict, list)):
+        # 件数だけ必要な場合に本文を解析しなくて済むよう記録
+        header += f" count={len(data)}"
+    header += "\n"
+
+    directory = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header.encode('ascii'))
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+            stat = os.fstat(f.fileno())
+        _keep_previous_generation(path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    _fsync_directory(directory)
+    if cache_path:
+        _save_snapshot_cache(cache_path, _cache_key(digest, stat), data, generation)
+
+def _cache_key(digest: str, stat: os.stat_result) -> Tuple:
+    """キャッシュの有効性判定キー（本文のSHA-256とサイズ・mtime）"""
+    return (digest, stat.st_size, stat.st_mtime_ns)
+
+def _load_snapshot_cache(path: str, cache_path: str):
+    """YAMLが変わっていなければキャッシュから（データ, 世代番号）を返す。使えなければNone"""
+    try:
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            header = parse_header(f.readline())
+        # ヘッダーの無い（アプリ外で作られた）ファイルはハッシュ計算が必要なので解析し直す
+        if not header.get("sha256"):
+            return None
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get("key") != _cache_key(header["sha256"], stat):
+        return None
+    return cached["data"], cached["generation"]
+
+def _save_snapshot_cache(cache_path: str, key: Tuple, data: any, generation: int):
+    """解析済みデータをバイナリキャッシュとして保存（失敗しても本体の読み書きには影響させない）"""
+    directory = os.path.dirname(cache_path) or "."
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump({"key": key, "generation": generation, "data": data}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def _keep_previous_generation(path: str):
+    """置き換え前の内容を .bak として残す（ハードリンクなので途中状態は生じない）"""
+    if not os.path.exists(path):
+        return
+    temp_link = f"{backup_path(path)}.tmp"
+    try:
+        if os.path.exists(temp_link):
+            os.remove(temp_link)
+        os.link(path, temp_link)
+        os.replace(temp_link, backup_path(path))
+    except OSError:
+        pass  # ハードリンク非対応のファイルシステムでは世代を残さない
+
+def _fsync_directory(directory: str):
+    """rename をディスクへ確定（POSIXのみ）"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)